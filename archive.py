@@ -0,0 +1,90 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module holds an archive of the best satellites found over a whole run of the genetic algorithm, rather than only
+those in the current population. The archive keeps the satellites that are not epsilon dominated, the objectives are
+divided into boxes of size epsilon, only one satellite is kept per box and only the boxes not dominated by another box
+are kept. The archive never holds more than its capacity, the most crowded satellites are dropped when it is full.
+"""
+
+import numpy as np
+
+from population import Population, population_union
+from ranking import non_dominated_sort, crowding_distance
+
+
+class ParetoArchive:
+    """
+    A bounded epsilon dominance archive of satellites, stored as a population.Population
+    """
+    def __init__(self, capacity, epsilon=0.01):
+        """
+        Creates an empty archive
+        :param capacity: The most satellites held by the archive
+        :param epsilon: The box size of the objectives, a single value or one per objective
+        """
+        self.capacity = capacity
+        self.epsilon = np.asarray(epsilon, dtype=np.float64)
+        self.population = None
+
+    def __len__(self):
+        return 0 if self.population is None else len(self.population)
+
+    def insert(self, satellites):
+        """
+        Inserts a generation of satellites, every satellite is checked against the archive and the rest of the
+        generation at once. Satellites without their fitness calculated are ignored
+        :param satellites: list of ID based satellite dicts, or a Population, with the fitness calculated
+        :return: The number of the satellites that entered the archive
+        """
+        candidates = satellites if isinstance(satellites, Population) else Population.from_dicts(satellites)
+        candidates = candidates.take(~np.isnan(candidates.fitness).any(axis=1))
+        pool = candidates if self.population is None else population_union(self.population, candidates)
+        if not len(pool):
+            return 0
+
+        # Each box keeps the satellite nearest its lower corner, which includes any satellite dominating the others in
+        # the box. The archive is first in the pool, so it keeps its satellites on a tie
+        boxes = np.floor(pool.fitness / self.epsilon)
+        corner_dist = np.sum((pool.fitness - boxes * self.epsilon) ** 2, axis=1)
+        box_ids = np.unique(boxes, axis=0, return_inverse=True)[1].reshape(-1)
+        order = np.lexsort((corner_dist, box_ids))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = box_ids[order[1:]] != box_ids[order[:-1]]
+        kept = order[first]
+
+        # Only the boxes not dominated by another box are kept
+        kept = kept[non_dominated_sort(boxes[kept]) == 0]
+        if len(kept) > self.capacity:
+            distance = crowding_distance(pool.fitness[kept], np.zeros(len(kept), dtype=np.int64))
+            kept = kept[np.argsort(-distance, kind='stable')[:self.capacity]]
+        kept = np.sort(kept)
+
+        archived = 0 if self.population is None else len(self.population)
+        self.population = pool.take(kept)
+        return int(np.sum(kept >= archived))
+
+    @property
+    def fitness(self):
+        """
+        The fitness of the archived satellites
+        :return: Matrix of fitness values, one row per satellite
+        """
+        if self.population is None:
+            return np.empty((0, 0))
+        return self.population.fitness.copy()
+
+    def satellites(self, catalogue=None):
+        """
+        The archived satellites
+        :param catalogue: If given, the satellites use the names from the catalogue rather than the IDs
+        :return: list of satellite dicts
+        """
+        return [] if self.population is None else self.population.to_dicts(catalogue)
+
+    def nbytes(self):
+        """
+        The memory held by the archive
+        :return: Total size in bytes
+        """
+        return 0 if self.population is None else self.population.nbytes()
@@ -0,0 +1,255 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module benchmarks the hot paths of the genetic algorithm and the ARTMAP network over a grid of population,
+catalogue and dataset sizes. The results are written as JSON alongside the details of the machine, and can be compared
+against the results of an earlier run, kept as a baseline, to flag any benchmark that has become slower.
+
+Run as:
+    python benchmark.py --output results.json
+    python benchmark.py --output results.json --baseline baseline.json
+The catalogue sizes are made by resampling the rows of the loaded components, so any size can be benchmarked with the
+catalogue available.
+"""
+
+import argparse
+from contextlib import contextmanager, redirect_stdout
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import nsga
+from catalogue import Catalogue
+from components import structures, components, panels
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ArtMAP'))
+import artmap_utils
+from training import artmap_learning
+
+GA_BENCHMARKS = ('create_population', 'create_child_population', 'mutate_satellite', 'calculate_satellite_metrics',
+                 'calculate_fitness', 'calculate_rankings')
+DEFAULT_GRID = {'pop_sizes': [50, 200, 1000], 'catalogue_sizes': [100, 1000, 10000], 'dataset_sizes': [50, 200, 500]}
+QUICK_GRID = {'pop_sizes': [50], 'catalogue_sizes': [100], 'dataset_sizes': [50]}
+REPEATS = 5
+# A benchmark is flagged once its median time is this fraction slower than the baseline
+REGRESSION_TOLERANCE = 0.25
+BENCHMARK_TARGET = np.array([0.334, 0.5, 0.334, 0.5, 0.334])
+BENCHMARK_MUT_RATE = 0.3
+# The number of customer requirement features given to the ARTMAP network, before complement coding
+ARTMAP_FEATURES = 10
+
+
+def machine_info():
+    """
+    Describes the machine and software the benchmarks are run with
+    :return: dict of the machine details
+    """
+    return {'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__}
+
+
+def time_call(function, setup=None, repeats=REPEATS):
+    """
+    Times a function, anything it prints is discarded
+    :param function: The function to time, called with the arguments returned by setup
+    :param setup: Creates the arguments of each call outside of the timing, None calls the function without arguments
+    :param repeats: The number of timed calls
+    :return: The median and the best time in seconds
+    """
+    times = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            args = setup() if setup is not None else ()
+            start = time.perf_counter()
+            function(*args)
+            times.append(time.perf_counter() - start)
+    return float(np.median(times)), float(np.min(times))
+
+
+@contextmanager
+def catalogue_of_size(size, rng):
+    """
+    Replaces the catalogue of the genetic algorithm with one of the given number of components, resampled from the
+    loaded components. The loaded catalogue is restored afterwards
+    :param size: The number of components
+    :param rng: numpy random Generator
+    """
+    resampled = components.iloc[rng.integers(0, len(components), size=size)].reset_index(drop=True)
+    loaded = nsga.catalogue, nsga.NUM_OF_COMPONENTS
+    nsga.catalogue = Catalogue(structures, resampled, panels, nsga.SIDE_PANELS_TOTAL)
+    nsga.NUM_OF_COMPONENTS = size - 1
+    try:
+        yield nsga.catalogue
+    finally:
+        nsga.catalogue, nsga.NUM_OF_COMPONENTS = loaded
+
+
+def copy_population(population):
+    """
+    Copies a population, so a benchmark that changes the satellites starts from the same population each time
+    :param population: A population of ID based satellites
+    :return: The copied population
+    """
+    return [dict(satellite, Components=list(satellite['Components']), Details=satellite['Details'].copy())
+            for satellite in population]
+
+
+def ga_benchmarks(pop_size, catalogue_size, repeats=REPEATS, seed=0):
+    """
+    Times the genetic algorithm functions for a population and catalogue size
+    :param pop_size: The number of satellites
+    :param catalogue_size: The number of components in the catalogue
+    :param repeats: The number of timed calls of each function
+    :param seed: The seed of the random numbers
+    :return: list of result dicts
+    """
+    rng = np.random.default_rng(seed)
+    with catalogue_of_size(catalogue_size, rng):
+        population = nsga.create_population(pop_size, rng)
+        evaluated = nsga.calculate_fitness(nsga.calculate_population_metrics(copy_population(population)),
+                                           BENCHMARK_TARGET)
+
+        def fresh():
+            # The satellites with their metrics cleared, so they are fully calculated
+            return [dict(satellite, Components=list(satellite['Components']), Details=satellite['Details'].copy(),
+                         Metrics=np.array([], ndmin=1)) for satellite in population]
+
+        calls = {'create_population': (lambda: nsga.create_population(pop_size, rng), None),
+                 'create_child_population': (lambda parents: nsga.create_child_population(parents, rng),
+                                             lambda: (copy_population(population),)),
+                 'mutate_satellite': (lambda satellites: [nsga.mutate_satellite(satellite, BENCHMARK_MUT_RATE, rng)
+                                                          for satellite in satellites],
+                                      lambda: (copy_population(population),)),
+                 'calculate_satellite_metrics': (lambda satellites: [nsga.calculate_satellite_metrics(satellite)
+                                                                     for satellite in satellites],
+                                                 lambda: (fresh(),)),
+                 'calculate_fitness': (lambda satellites: nsga.calculate_fitness(satellites, BENCHMARK_TARGET),
+                                       lambda: (copy_population(evaluated),)),
+                 'calculate_rankings': (lambda satellites: nsga.calculate_rankings(satellites),
+                                        lambda: (copy_population(evaluated),))}
+
+        results = []
+        for name in GA_BENCHMARKS:
+            function, setup = calls[name]
+            median, best = time_call(function, setup, repeats)
+            results.append({'benchmark': name, 'pop_size': pop_size, 'catalogue_size': catalogue_size,
+                            'seconds': median, 'best': best, 'repeats': repeats})
+    return results
+
+
+def artmap_benchmarks(dataset_size, repeats=REPEATS, seed=0):
+    """
+    Times the training and classification of the ARTMAP network for a dataset size
+    :param dataset_size: The number of samples
+    :param repeats: The number of timed calls of each function
+    :param seed: The seed of the random numbers
+    :return: list of result dicts
+    """
+    rng = np.random.default_rng(seed)
+    data = artmap_utils.complement_code(rng.random((ARTMAP_FEATURES, dataset_size)))
+    supervisor = rng.integers(0, 2, size=(1, dataset_size))
+
+    def untrained():
+        return artmap_utils.create_net(data.shape[0], 2), data, supervisor
+
+    with redirect_stdout(io.StringIO()):
+        trained = artmap_learning(*untrained())
+
+    results = []
+    for name, function, setup in (('artmap_learning', artmap_learning, untrained),
+                                  ('classify', artmap_utils.classify, lambda: (trained, data, trained['vigilance']))):
+        median, best = time_call(function, setup, repeats)
+        results.append({'benchmark': name, 'dataset_size': dataset_size, 'seconds': median, 'best': best,
+                        'repeats': repeats})
+    return results
+
+
+def run_benchmarks(grid=None, repeats=REPEATS, seed=0, verbose=True):
+    """
+    Runs every benchmark over the grid of sizes
+    :param grid: dict of the pop_sizes, catalogue_sizes and dataset_sizes lists, defaults to DEFAULT_GRID
+    :param repeats: The number of timed calls of each function
+    :param seed: The seed of the random numbers
+    :param verbose: Whether to print each result
+    :return: dict of the machine details, the grid and the list of results
+    """
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    results = []
+    for catalogue_size in grid['catalogue_sizes']:
+        for pop_size in grid['pop_sizes']:
+            results.extend(ga_benchmarks(pop_size, catalogue_size, repeats, seed))
+    for dataset_size in grid['dataset_sizes']:
+        results.extend(artmap_benchmarks(dataset_size, repeats, seed))
+
+    if verbose:
+        for result in results:
+            print('%-28s %-36s %.6fs' % (result['benchmark'], ' '.join(result_key(result)[1:]), result['seconds']))
+    return {'machine': machine_info(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'grid': grid,
+            'repeats': repeats,
+            'results': results}
+
+
+def result_key(result):
+    """
+    Identifies a result by its benchmark and sizes, for matching against a baseline
+    :param result: A result dict
+    :return: Hashable tuple
+    """
+    return (result['benchmark'],) + tuple('%s=%s' % (size, result[size])
+                                          for size in ('pop_size', 'catalogue_size', 'dataset_size') if size in result)
+
+
+def compare_results(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compares benchmark results against a baseline, results without a baseline are skipped
+    :param report: The report of run_benchmarks
+    :param baseline: An earlier report of run_benchmarks
+    :param tolerance: The fraction slower than the baseline that is flagged
+    :return: list of dicts of the regressions, with the baseline time and the ratio of the times
+    """
+    baseline_times = dict((result_key(result), result['seconds']) for result in baseline['results'])
+    regressions = []
+    for result in report['results']:
+        key = result_key(result)
+        if key not in baseline_times or baseline_times[key] <= 0:
+            continue
+        ratio = result['seconds'] / baseline_times[key]
+        if ratio > 1 + tolerance:
+            regressions.append(dict(result, baseline=baseline_times[key], ratio=ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the genetic algorithm and the ARTMAP network')
+    parser.add_argument('--output', default='benchmark_results.json', help='The JSON file the results are written to')
+    parser.add_argument('--baseline', help='An earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='The fraction slower than the baseline that is flagged as a regression')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='The number of timed calls of each function')
+    parser.add_argument('--quick', action='store_true', help='Only benchmark the smallest sizes')
+    args = parser.parse_args()
+
+    bench_report = run_benchmarks(QUICK_GRID if args.quick else None, args.repeats)
+    with open(args.output, 'w') as output_file:
+        json.dump(bench_report, output_file, indent=2)
+    print('Results written to ' + args.output)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = compare_results(bench_report, json.load(baseline_file), args.tolerance)
+        for regression in found:
+            print('REGRESSION %-28s %-36s %.6fs vs %.6fs baseline, %.2fx' %
+                  (regression['benchmark'], ' '.join(result_key(regression)[1:]), regression['seconds'],
+                   regression['baseline'], regression['ratio']))
+        print('%d regressions against %s' % (len(found), args.baseline))
+        sys.exit(1 if found else 0)
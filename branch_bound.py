@@ -0,0 +1,235 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module is an exact alternative to the genetic algorithm for small catalogues. Every structure, panel pair and
+multiset of components is searched depth first by branch and bound, keeping the Pareto set of the fitness objectives
+of nsga.calculate_fitness. Any partial design is itself a satellite, so every node of the search is evaluated, and the
+designs reachable from a node are skipped once an optimistic bound on their fitness is matched by the Pareto set.
+
+Adding components only increases the volume and mass, only raises the maximum bit rates and detail, and can only add
+the positive memory, power, discharge and attitude moment of the components left. The bound takes each of those at the
+best value reachable from the node. The wavelength and attitude knowledge keep their current value where no component
+left could change them, otherwise they are taken as met. With a time or node limit the search stops early and returns
+the Pareto set found so far.
+"""
+
+import time
+
+import numpy as np
+
+import nsga
+from evaluation import evaluate_genomes, combine_population, section_metrics
+from population import NUM_METRICS
+from ranking import non_dominated_sort
+
+# The objectives bounded from the optimistic combined values, all but the attitude knowledge and wavelength
+BOUNDED_OBJECTIVES = np.array([True, True, True, True, True, True, True, False, False, True])
+# The combined value columns that are maxima, the detail and bit rates, and the raw value columns they come from
+MAX_COLUMNS = [5, 6, 7]
+MAX_VALUES = [6, 7, 8]
+# The combined value columns that are sums, the nominal power, data, code, RAM, attitude moment and discharge, and the
+# raw value columns they come from
+SUM_COLUMNS = [2, 8, 9, 10, 12, 14]
+SUM_VALUES = [2, 9, 10, 11, 13, 14]
+# The number of designs evaluated at a time
+BATCH_SIZE = 1000
+# Bound on the number of values held in memory at once when comparing designs with the Pareto set or the components
+COMPARISON_CHUNK = 2 ** 22
+
+
+class ParetoFront:
+    """
+    The exact Pareto set of the designs evaluated so far, designs with the same fitness are only kept once
+    """
+    def __init__(self):
+        self.fitness = np.empty((0, NUM_METRICS))
+        self.metrics = np.empty((0, NUM_METRICS))
+        self.designs = []
+
+    def __len__(self):
+        return len(self.designs)
+
+    def covers(self, fitness):
+        """
+        Checks whether each fitness is matched or dominated by a design in the set
+        :param fitness: Matrix of fitness values, one row per design
+        :return: Boolean vector
+        """
+        covered = np.zeros(len(fitness), dtype=bool)
+        step = max(1, COMPARISON_CHUNK // max(self.fitness.size, 1))
+        for start in range(0, len(fitness), step):
+            chunk = fitness[start:start + step]
+            covered[start:start + step] = (self.fitness[None] <= chunk[:, None]).all(axis=2).any(axis=1)
+        return covered
+
+    def insert(self, fitness, metrics, nodes):
+        """
+        Adds the designs not covered by the set, dropping those of the set they dominate
+        :param fitness: Matrix of fitness values, one row per design
+        :param metrics: Matrix of metrics, one row per design
+        :param nodes: The batch of designs, see branch_and_bound
+        """
+        new = np.where(~self.covers(fitness))[0]
+        if not len(new):
+            return
+        # Only the first of the new designs with each non-dominated fitness is kept
+        new = new[non_dominated_sort(fitness[new]) == 0]
+        new = new[np.sort(np.unique(fitness[new], axis=0, return_index=True)[1])]
+
+        dominated = ((fitness[new][:, None] <= self.fitness[None]).all(axis=2) &
+                     (fitness[new][:, None] < self.fitness[None]).any(axis=2)).any(axis=0)
+        self.fitness = np.concatenate((self.fitness[~dominated], fitness[new]))
+        self.metrics = np.concatenate((self.metrics[~dominated], metrics[new]))
+        self.designs = [design for design, drop in zip(self.designs, dominated) if not drop] + \
+            [design_satellite(nodes, j) for j in new]
+
+
+def branch_and_bound(target_reqs, max_copies=1, time_limit=None, max_nodes=None, verbose=True):
+    """
+    Finds the Pareto set of satellites for the customer requirements by branch and bound
+    :param target_reqs: The customer requirements to evolve towards, as genetic_algorithm
+    :param max_copies: The most copies of any one component in a satellite
+    :param time_limit: Stop after this many seconds, returning the Pareto set found so far
+    :param max_nodes: Stop after evaluating this many designs
+    :param verbose: Whether to print the progress of the search
+    :return: The Pareto set of satellites with their names, in the population format of genetic_algorithm, and whether
+    the search was completed, making the set exact
+    """
+    catalogue = nsga.catalogue
+    goals = nsga.fitness_goals(target_reqs)
+    values = catalogue.component_values
+    bounded = BOUNDED_OBJECTIVES.copy()
+    # Volume and mass only grow as components are added if no component has a negative volume or mass, the attitude
+    # moment bound relies on the mass
+    bounded[:2] = (values[:, :2] >= 0).all(axis=0)
+    bounded[6] = bounded[1]
+    positive_sums = np.clip(values[:, SUM_VALUES], 0, None) * max_copies
+
+    # The roots are every structure and panel pair without any components
+    structure, side, end = [grid.reshape(-1) for grid in np.meshgrid(np.arange(catalogue.num_structures),
+                                                                     catalogue.side_panels, catalogue.end_panels,
+                                                                     indexing='ij')]
+    stack = [{'structure': structure,
+              'panels': np.column_stack((side, end)),
+              'components': np.empty((len(structure), 0), dtype=np.int64),
+              'last': np.full(len(structure), -1),
+              'copies': np.zeros(len(structure), dtype=np.int64),
+              'available': catalogue.structure_internal[structure].astype(np.float64),
+              'avail_ext': catalogue.structure_external[structure].astype(np.float64)}]
+
+    front = ParetoFront()
+    start = time.time()
+    evaluated = 0
+    pruned = 0
+    while stack:
+        if time_limit is not None and time.time() - start >= time_limit:
+            break
+        if max_nodes is not None and evaluated >= max_nodes:
+            break
+        nodes = stack.pop()
+        size = len(nodes['structure'])
+        num_components = np.full(size, nodes['components'].shape[1])
+        evaluated += size
+
+        metrics = evaluate_genomes(nodes['structure'], nodes['panels'], nodes['components'], num_components,
+                                   catalogue)
+        fitness = nsga.calculate_fitness_matrix(metrics, goals)
+        front.insert(fitness, metrics, nodes)
+
+        # The components which could still be added, in ID order from the last so each multiset is searched once
+        ids = np.arange(catalogue.num_components)
+        candidates = (ids[None] > nodes['last'][:, None]) | \
+            ((ids[None] == nodes['last'][:, None]) & (nodes['copies'][:, None] < max_copies))
+        candidates &= (nodes['available'][:, None] + catalogue.component_internal[None] > 0) & \
+            (nodes['avail_ext'][:, None] + catalogue.component_external[None] > 0)
+
+        # The best each bounded objective could reach from the node. The power also gains from a larger peak power
+        combined = combine_population(nodes['components'], num_components, values)
+        optimistic = combined.copy()
+        optimistic[:, MAX_COLUMNS] = np.maximum(combined[:, MAX_COLUMNS],
+                                                candidate_max(candidates, values[:, MAX_VALUES]))
+        optimistic[:, SUM_COLUMNS] += candidates @ positive_sums
+        peak_power = np.max(values[nodes['components'], 3], axis=1, initial=-np.inf)
+        peak_power = np.where(num_components > 0, peak_power, 0)
+        optimistic[:, 2] += np.clip(candidate_max(candidates, values[:, [3]])[:, 0] - peak_power, 0, None)
+        bound = section_metrics(catalogue.structure_values[nodes['structure']], optimistic,
+                                catalogue.panel_values[nodes['panels']], catalogue.structure_size[nodes['structure']])
+        bound = np.where(bounded, nsga.calculate_fitness_matrix(bound, goals), 0)
+
+        # The attitude knowledge is the smallest positive value, and the wavelength the smallest minimum and largest
+        # maximum. An empty satellite has a wavelength of 0, which any component would change
+        knowledge = values[None, :, 12]
+        fixed_knowledge = ~(candidates & (knowledge > 0) &
+                            ((combined[:, 11:12] == 0) | (knowledge < combined[:, 11:12]))).any(axis=1)
+        fixed_wavelength = ~(candidates & ((num_components[:, None] == 0) | (values[None, :, 4] < combined[:, 3:4]) |
+                                           (values[None, :, 5] > combined[:, 4:5]))).any(axis=1)
+        bound[:, 7] = np.where(fixed_knowledge, fitness[:, 7], 0)
+        bound[:, 8] = np.where(fixed_wavelength, fitness[:, 8], 0)
+
+        branching = candidates.any(axis=1)
+        covered = branching & front.covers(bound)
+        pruned += int(np.sum(covered))
+        branching &= ~covered
+        rows, added = np.nonzero(candidates & branching[:, None])
+        stack.extend(reversed(branch(nodes, rows, added, catalogue)))
+
+    complete = not stack
+    if verbose:
+        print('Evaluated %d designs, pruned %d branches in %.1fs, Pareto set of %d, %s' %
+              (evaluated, pruned, time.time() - start, len(front), 'complete' if complete else 'stopped early'))
+
+    population = []
+    for design, metrics, fitness in zip(front.designs, front.metrics, front.fitness):
+        satellite = dict(design, Metrics=metrics, Fitness=fitness, Rank=0)
+        population.append(catalogue.name_satellite(satellite))
+    return population, complete
+
+
+def candidate_max(candidates, values):
+    """
+    The largest value of each column over the candidate components of each design
+    :param candidates: Boolean matrix of the components that could be added, one row per design
+    :param values: The raw values of every component, one column per value
+    :return: Matrix of the largest values, -inf where a design has no candidates
+    """
+    largest = np.empty((len(candidates), values.shape[1]))
+    step = max(1, COMPARISON_CHUNK // max(values.size, 1))
+    for start in range(0, len(candidates), step):
+        largest[start:start + step] = np.max(np.where(candidates[start:start + step, :, None], values[None], -np.inf),
+                                             axis=1, initial=-np.inf)
+    return largest
+
+
+def branch(nodes, rows, added, catalogue):
+    """
+    Creates the child designs of a batch, each adding one component to a design
+    :param nodes: The batch of designs
+    :param rows: The design of each child
+    :param added: The component added by each child
+    :param catalogue: The compiled catalogue
+    :return: list of the batches of children, of at most BATCH_SIZE each
+    """
+    children = {'structure': nodes['structure'][rows],
+                'panels': nodes['panels'][rows],
+                'components': np.column_stack((nodes['components'][rows], added)),
+                'last': added,
+                'copies': np.where(added == nodes['last'][rows], nodes['copies'][rows] + 1, 1),
+                'available': nodes['available'][rows] + catalogue.component_internal[added],
+                'avail_ext': nodes['avail_ext'][rows] + catalogue.component_external[added]}
+    return [dict((key, array[start:start + BATCH_SIZE]) for key, array in children.items())
+            for start in range(0, len(rows), BATCH_SIZE)]
+
+
+def design_satellite(nodes, j):
+    """
+    Creates the ID based satellite dict of a design in a batch, without its metrics and fitness
+    :param nodes: The batch of designs
+    :param j: The index of the design in the batch
+    :return: The satellite dict
+    """
+    structure = int(nodes['structure'][j])
+    return {'Structure': structure,
+            'Components': nodes['components'][j].tolist(),
+            'Panels': [nodes['panels'][j].tolist()],
+            'Details': np.array([nsga.catalogue.structure_internal[structure], nodes['available'][j],
+                                 nsga.catalogue.structure_external[structure], nodes['avail_ext'][j]], ndmin=1)}
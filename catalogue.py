@@ -0,0 +1,168 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module compiles the component, structure and panel data frames into a catalogue of contiguous numpy columns. Every
+entry is given a dense integer ID, its row position in the data frame, so the genetic algorithm can refer to parts by
+number rather than searching the data frames by name. The raw values needed for the satellite metrics are also parsed
+once here, rather than every time a satellite is evaluated.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+# The most available slot states whose fitting slot cost groups are kept, the least recently used are dropped
+FITTING_CACHE_SIZE = 4096
+
+
+class Catalogue:
+    """
+    A read only, columnar copy of the databases utilised by the genetic algorithm. It is built once when the databases
+    are loaded, with name to ID dictionaries for converting satellites to and from their readable form
+    """
+    def __init__(self, structures, components, panels, side_panels):
+        """
+        Compiles the catalogue from the pandas data frames
+        :param structures: Data frame of the structures
+        :param components: Data frame of the internal and external components
+        :param panels: Data frame of the panels, the side panels are listed first followed by the end panels
+        :param side_panels: The number of side panels at the start of the panels data frame
+        """
+        self.structure_names = structures['Name'].values.astype(object)
+        self.structure_size = np.ascontiguousarray(structures['Size'].values, dtype=np.float64)
+        self.structure_internal = np.ascontiguousarray(structures['Internal Slots'].values)
+        self.structure_external = np.ascontiguousarray(structures['External Slots'].values)
+
+        self.component_names = components['Name'].values.astype(object)
+        self.component_internal = np.ascontiguousarray(components['Internal Slots'].values)
+        self.component_external = np.ascontiguousarray(components['External Slots'].values)
+
+        self.panel_names = panels['Name'].values.astype(object)
+        self.side_panels = np.arange(side_panels)
+        self.end_panels = np.arange(side_panels, len(self.panel_names))
+
+        # Raw values matrices, one row per ID, columns as given by parse_values
+        self.structure_values = parse_values(structures)
+        self.component_values = parse_values(components)
+        self.panel_values = parse_values(panels)
+
+        self.num_structures = len(self.structure_names)
+        self.num_components = len(self.component_names)
+        self.num_panels = len(self.panel_names)
+
+        self.structure_ids = name_map(self.structure_names)
+        self.component_ids = name_map(self.component_names)
+        self.panel_ids = name_map(self.panel_names)
+
+        # The components grouped by their internal and external slot costs, the IDs of group i are
+        # slot_cost_components[slot_cost_offsets[i]:slot_cost_offsets[i + 1]]
+        costs = np.column_stack((self.component_internal, self.component_external))
+        self.slot_costs, groups = np.unique(costs, axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        self.slot_cost_components = np.argsort(groups, kind='stable')
+        self.slot_cost_offsets = np.concatenate(([0], np.cumsum(np.bincount(groups, minlength=len(self.slot_costs)))))
+        # The fitting groups of the available slots seen most recently, see fitting_groups
+        self.fitting_cache = OrderedDict()
+
+    def fitting_cost_groups(self, available_slots, avail_ext_slots):
+        """
+        Finds the slot cost groups whose components fit a satellite, a component fits while adding its costs leaves
+        some internal and external slots available
+        :param available_slots: The available internal slots of the satellite
+        :param avail_ext_slots: The available external slots of the satellite
+        :return: Boolean vector over the slot cost groups
+        """
+        return (available_slots + self.slot_costs[:, 0] > 0) & (avail_ext_slots + self.slot_costs[:, 1] > 0)
+
+    def fitting_groups(self, available_slots, avail_ext_slots):
+        """
+        Finds the slot cost groups whose components fit a satellite, see fitting_cost_groups. The groups of the most
+        recent FITTING_CACHE_SIZE states are kept, they are small as there are few distinct slot costs
+        :param available_slots: The available internal slots of the satellite
+        :param avail_ext_slots: The available external slots of the satellite
+        :return: Vector of the fitting group indices, the running total of their numbers of components, and whether any
+        of them takes up an internal slot
+        """
+        key = (available_slots, avail_ext_slots)
+        fitting = self.fitting_cache.get(key)
+        if fitting is None:
+            groups = np.where(self.fitting_cost_groups(available_slots, avail_ext_slots))[0]
+            totals = np.cumsum(np.diff(self.slot_cost_offsets)[groups])
+            fitting = (groups, totals, bool((self.slot_costs[groups, 0] < 0).any()))
+            self.fitting_cache[key] = fitting
+            if len(self.fitting_cache) > FITTING_CACHE_SIZE:
+                self.fitting_cache.popitem(last=False)
+        else:
+            self.fitting_cache.move_to_end(key)
+        return fitting
+
+    def fitting_component(self, groups, totals, position):
+        """
+        Finds a component of the fitting groups, which are taken to list their components one group after another
+        :param groups: Vector of the fitting group indices, from fitting_groups
+        :param totals: The running total of the numbers of components in the groups, from fitting_groups
+        :param position: The position of the component in the fitting groups, from 0
+        :return: The component ID
+        """
+        k = int(np.searchsorted(totals, position, side='right'))
+        start = totals[k - 1] if k else 0
+        return int(self.slot_cost_components[self.slot_cost_offsets[groups[k]] + position - start])
+
+    def name_satellite(self, satellite):
+        """
+        Creates a copy of an ID based satellite with the structure, components and panels replaced by their names
+        :param satellite: A satellite dict as used by the genetic algorithm
+        :return: A new satellite dict with names in place of IDs
+        """
+        named = dict(satellite)
+        named['Structure'] = self.structure_names[satellite['Structure']]
+        named['Components'] = [self.component_names[comp] for comp in satellite['Components']]
+        named['Panels'] = [[self.panel_names[panel] for panel in pair] for pair in satellite['Panels']]
+        return named
+
+    def number_satellite(self, satellite):
+        """
+        The reverse of name_satellite, creates a copy of a named satellite with IDs in place of the names
+        :param satellite: A satellite dict with the structure, components and panels given by name
+        :return: A new satellite dict with IDs in place of names
+        """
+        numbered = dict(satellite)
+        numbered['Structure'] = self.structure_ids[satellite['Structure']]
+        numbered['Components'] = [self.component_ids[comp] for comp in satellite['Components']]
+        numbered['Panels'] = [[self.panel_ids[panel] for panel in pair] for pair in satellite['Panels']]
+        return numbered
+
+
+def parse_values(frame):
+    """
+    Parses every row of a data frame into the raw values utilised by the genetic algorithm, these are converted into
+    the appropriate metrics later
+    :param frame: Pandas data frame of structures, components or panels
+    :return: numpy array of size rows by 16, the columns are volume, mass, nom power, max power, min wavelength, max
+    wavelength, detail, bit rate down, bit rate up, data, code, ram, attitude knowledge, attitude moment, discharge and
+    price
+    """
+    volume = frame['X'].values * frame['Y'].values * frame['Z'].values
+    nom_power = frame['Nom Power'].values
+    max_power = frame['Power (W)'].values - nom_power
+
+    values = np.column_stack((volume, frame['Mass'].values, nom_power, max_power,
+                              frame['Min Wavelength (nm)'].values, frame['Max Wavelength (nm)'].values,
+                              frame['Resolution'].values, frame['Bit Rate Down'].values, frame['Bit Rate Up'].values,
+                              frame['Data Storage (MB)'].values, frame['Code Storage (MB)'].values, frame['RAM'].values,
+                              frame['Attitude Know (deg)'].values, frame['Attitude Control moment'].values,
+                              frame['Discharge Time (Wh)'].values, frame['Price ($US)'].values))
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def name_map(names):
+    """
+    Creates the name to ID dictionary for a column of names. Where a name is repeated the first ID is kept, matching a
+    search of the data frame by name
+    :param names: Array of names in ID order
+    :return: dict of name to integer ID
+    """
+    ids = {}
+    for i, name in enumerate(names):
+        ids.setdefault(name, i)
+    return ids
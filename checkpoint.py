@@ -0,0 +1,111 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module saves and restores the state of a genetic algorithm run, so a long run can be resumed after an interruption.
+A checkpoint holds the population arrays, the generation history, the state of the random Generator and the options the
+run was started with in a single uncompressed numpy archive. It is written to a temporary file which then replaces the
+previous checkpoint, so an interruption while writing never leaves a partial checkpoint behind.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from population import Population
+from history import GenerationHistory
+
+POPULATION_FIELDS = ('structure', 'panels', 'components', 'num_components', 'details', 'metrics', 'fitness', 'rank')
+
+
+class Checkpointer:
+    """
+    Writes checkpoints during a run, every so many generations, every so many seconds, or both
+    """
+    def __init__(self, path, generations=None, seconds=None):
+        """
+        Sets where and how often checkpoints are written
+        :param path: The checkpoint file, replaced by each new checkpoint
+        :param generations: Write a checkpoint every this many generations
+        :param seconds: Write a checkpoint once this many seconds have passed since the last
+        """
+        self.path = path
+        self.generations = generations
+        self.seconds = seconds
+        self.last_time = time.time()
+
+    def due(self, generation):
+        """
+        Checks whether a checkpoint is due after a generation
+        :param generation: The generation just completed, from 0
+        :return: True if a checkpoint should be written
+        """
+        if self.generations is not None and not (generation + 1) % self.generations:
+            return True
+        return self.seconds is not None and time.time() - self.last_time >= self.seconds
+
+    def save(self, generation, population, history, rng, options=None):
+        """
+        Writes a checkpoint, see save_checkpoint
+        """
+        save_checkpoint(self.path, generation, population, history, rng, options)
+        self.last_time = time.time()
+
+
+def save_checkpoint(path, generation, population, history, rng, options=None):
+    """
+    Writes the state of a run to a checkpoint file, atomically replacing any existing file
+    :param path: The checkpoint file
+    :param generation: The next generation to run
+    :param population: The current population of ID based satellites
+    :param history: The history.GenerationHistory of the run
+    :param rng: The numpy random Generator of the run
+    :param options: dict of the options of the run which a resumed run must match, such as the population size
+    """
+    pop = Population.from_dicts(population)
+    arrays = dict((field, getattr(pop, field)) for field in POPULATION_FIELDS)
+    arrays['generation'] = np.array(generation)
+    arrays['performance_data'] = history.performance_data[:len(history)]
+    arrays['metric_performance_data'] = history.metric_performance_data[:len(history)]
+    arrays['rng_state'] = np.array(json.dumps(rng.bit_generator.state))
+    arrays['options'] = np.array(json.dumps(options or {}))
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as checkpoint_file:
+        np.savez(checkpoint_file, **arrays)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path, generations=None, options=None):
+    """
+    Reads the state of a run from a checkpoint file
+    :param path: The checkpoint file
+    :param generations: The expected total number of generations, for preallocating the history
+    :param options: dict of the options of the resumed run, a ValueError is raised if any differ from those saved
+    :return: The next generation to run, the population, the history.GenerationHistory and the random Generator
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        pop = Population(len(arrays['structure']), arrays['components'].shape[1], arrays['details'].dtype)
+        for field in POPULATION_FIELDS:
+            getattr(pop, field)[:] = arrays[field]
+        generation = int(arrays['generation'])
+        performance_data = arrays['performance_data']
+        metric_performance_data = arrays['metric_performance_data']
+        state = json.loads(str(arrays['rng_state']))
+        saved_options = json.loads(str(arrays['options'])) if 'options' in arrays else {}
+
+    differing = sorted(key for key in saved_options if key in (options or {}) and options[key] != saved_options[key])
+    if differing:
+        raise ValueError('The checkpoint was saved with different options: ' +
+                         ', '.join('%s %r, not %r' % (key, saved_options[key], options[key]) for key in differing))
+
+    history = GenerationHistory(max(generations or 0, len(performance_data)), metric_performance_data.shape[1])
+    for performance, metric_perfs in zip(performance_data, metric_performance_data):
+        history.record(performance[0], performance[1], performance[2], metric_perfs)
+
+    bit_generator = getattr(np.random, state['bit_generator'])()
+    bit_generator.state = state
+    return generation, pop.to_dicts(), history, np.random.Generator(bit_generator)
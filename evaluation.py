@@ -0,0 +1,435 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module evaluates the metrics for a whole population of satellites at once. It is the array equivalent of
+nsga.calculate_satellite_metrics, with every scalar metric function given an array version. The components of all the
+satellites are gathered from the catalogue in one go and reduced per satellite with segment sums, maxima and minima.
+Metrics do not depend on the target requirements, so they can also be cached by genome between generations. Large
+populations can be split across worker processes with the ParallelEvaluator.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import os
+import numpy as np
+
+from population import EMPTY_SLOT
+
+# Number of satellites evaluated at a time, bounds the memory of the gathered component values
+CHUNK_SIZE = 4096
+# The smallest number of satellites split across worker processes by the ParallelEvaluator, only the satellites
+# actually evaluated count, not those taken from the evaluation cache. Sending a shard to a worker and back costs about
+# 0.5ms, with serial evaluation at about 3us per satellite, so two workers break even at around 300 satellites
+PARALLEL_MIN_SIZE = 500
+
+# The catalogue of a worker process, set by initialise_worker
+worker_catalogue = None
+
+
+def evaluate_population(population, catalogue, chunk_size=CHUNK_SIZE):
+    """
+    Calculates the metrics for every satellite in the population, the Population's metrics array is updated in place
+    :param population: A population.Population
+    :param catalogue: The compiled catalogue that the population's IDs refer to
+    :param chunk_size: The number of satellites to evaluate at a time
+    :return: The metrics matrix, number of satellites by 10
+    """
+    population.metrics[:] = evaluate_genomes(population.structure, population.panels, population.components,
+                                             population.num_components, catalogue, chunk_size)
+    return population.metrics
+
+
+def evaluate_genomes(structure, panels, components, num_components, catalogue, chunk_size=CHUNK_SIZE):
+    """
+    Calculates the metrics for satellites given as ID arrays, in the same order as calculate_satellite_metrics
+    :param structure: Vector of structure IDs
+    :param panels: Matrix of side and end panel IDs, one row per satellite
+    :param components: Matrix of component IDs, each row padded past its number of components
+    :param num_components: Vector of the number of components in each satellite
+    :param catalogue: The compiled catalogue that the IDs refer to
+    :param chunk_size: The number of satellites to evaluate at a time
+    :return: The metrics matrix, number of satellites by 10
+    """
+    metrics = np.empty((len(structure), 10))
+    for start in range(0, len(structure), chunk_size):
+        end = start + chunk_size
+        combined = combine_population(components[start:end], num_components[start:end], catalogue.component_values)
+        metrics[start:end] = section_metrics(catalogue.structure_values[structure[start:end]], combined,
+                                             catalogue.panel_values[panels[start:end]],
+                                             catalogue.structure_size[structure[start:end]])
+    return metrics
+
+
+def combine_population(components, num_components, component_values):
+    """
+    The array version of nsga.combine_values, reducing the raw values of each satellite's components
+    :param components: Matrix of component IDs, each row padded past its number of components
+    :param num_components: Vector of the number of components in each satellite
+    :param component_values: The raw values matrix of the catalogue's components
+    :return: Matrix of combined values, one row per satellite in the same columns as combine_values
+    """
+    size = len(num_components)
+    combined = np.zeros((size, 15))
+    filled = num_components > 0
+    if not filled.any():
+        return combined
+
+    # Gather every component in row order, the start of each satellite's segment comes from the counts
+    counts = num_components[filled]
+    ids = components[filled][np.arange(components.shape[1]) < counts[:, None]]
+    values = component_values[ids]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    sums = np.add.reduceat(values, starts, axis=0)
+    maxes = np.maximum.reduceat(values, starts, axis=0)
+    att_know = np.minimum.reduceat(np.where(values[:, 12] > 0, values[:, 12], np.inf), starts)
+    att_know[np.isinf(att_know)] = 0
+
+    combined[filled] = np.column_stack((sums[:, 0], sums[:, 1], sums[:, 2] + maxes[:, 3],
+                                        np.minimum.reduceat(values[:, 4], starts), maxes[:, 5], maxes[:, 6],
+                                        maxes[:, 7], maxes[:, 8], sums[:, 9], sums[:, 10], sums[:, 11], att_know,
+                                        sums[:, 13], sums[:, 15], sums[:, 14]))
+    return combined
+
+
+def combine_population_sections(structure_vals, component_vals, panel_vals, size):
+    """
+    The array version of nsga.combine_sections, it indexes the raw structure and panel values the same way
+    :param structure_vals: Raw values of each satellite's structure
+    :param component_vals: Combined values from combine_population
+    :param panel_vals: Raw values of each satellite's panels, number of satellites by 2 by 16
+    :param size: Vector of the structure sizes
+    :return: Matrix of combined sections, one row per satellite in the same columns as combine_sections
+    """
+    panel_sums = np.sum(panel_vals, axis=1)
+    mass = structure_vals[:, 1] + component_vals[:, 1] + 4 * panel_sums[:, 1] * size
+    max_power = structure_vals[:, 2] + component_vals[:, 2] + 4 * panel_sums[:, 2] * size
+    data = component_vals[:, 8] + structure_vals[:, 8]
+    code = component_vals[:, 9] + structure_vals[:, 9]
+    ram = component_vals[:, 10] + structure_vals[:, 10]
+    att_temp = np.column_stack((structure_vals[:, 11], component_vals[:, 11], panel_vals[:, 0, 11],
+                                panel_vals[:, 1, 11]))
+    att_know = np.min(np.where(att_temp > 0, att_temp, np.inf), axis=1)
+    att_know[np.isinf(att_know)] = 0
+    att_mom = structure_vals[:, 12] + component_vals[:, 12] + panel_vals[:, 0, 12] * 4 * size + panel_vals[:, 0, 12]
+    price = structure_vals[:, 13] + component_vals[:, 13] + 4 * panel_sums[:, 13] * size
+    discharge = structure_vals[:, 14] + component_vals[:, 14] + 4 * panel_sums[:, 14] * size
+
+    return np.column_stack((mass, max_power, component_vals[:, 3], component_vals[:, 4], component_vals[:, 5],
+                            component_vals[:, 6], component_vals[:, 7], data, code, ram, att_know, att_mom, price,
+                            discharge))
+
+
+def section_metrics(structure_vals, combined, panel_vals, size):
+    """
+    Converts the combined values of each satellite into its metrics
+    :param structure_vals: Raw values of each satellite's structure
+    :param combined: Combined values from combine_population
+    :param panel_vals: Raw values of each satellite's panels, number of satellites by 2 by 16
+    :param size: Vector of the structure sizes
+    :return: The metrics matrix, number of satellites by 10
+    """
+    raw_values = combine_population_sections(structure_vals, combined, panel_vals, size)
+    return np.column_stack((volume_metric_array(structure_vals[:, 0], combined[:, 0]),
+                            mass_metric_array(size, raw_values[:, 0]),
+                            cpu_metric_array(raw_values[:, 7], raw_values[:, 8], raw_values[:, 9]),
+                            power_metric_array(raw_values[:, -1], raw_values[:, 1], 1),
+                            br_metric_array(raw_values[:, 5]),
+                            br_metric_array(raw_values[:, 6]),
+                            att_moment_metric_array(raw_values[:, 0], raw_values[:, 11]),
+                            att_know_metric_array(raw_values[:, 10]),
+                            wavelength_metric_array(raw_values[:, 2], raw_values[:, 3]),
+                            raw_values[:, 4]))
+
+
+def volume_metric_array(max_volume, combined_volumes):
+    """
+    Array version of nsga.volume_metric
+    :param max_volume: The maximum allowed internal volumes
+    :param combined_volumes: The volumes of all the internal components
+    :return: Vector of volume metrics
+    """
+    vol = max_volume - combined_volumes
+    with np.errstate(over='ignore'):
+        penalty = np.where(vol < 0, np.exp(-vol) - 1, 0)
+    return np.clip(1 - penalty, 0, 1)
+
+
+def mass_metric_array(sat_size, sat_mass):
+    """
+    Array version of nsga.mass_metric
+    :param sat_size: Vector of the CubeSat sizes
+    :param sat_mass: Vector of the total satellite masses
+    :return: Vector of mass metrics
+    """
+    allowed = np.select([sat_size == 1, sat_size == 1.5, sat_size == 2, sat_size == 3], [1.33, 2, 2.66, 4],
+                        1.33 * sat_size)
+    mass = allowed - sat_mass
+    with np.errstate(over='ignore'):
+        penalty = np.where(mass < 0, np.exp(-mass) - 1, 0)
+    return np.clip(1 - penalty, 0, 1)
+
+
+def cpu_metric_array(data, code, ram):
+    """
+    Array version of components.calculate_cpu_metric, a check for the presence of a flightboard
+    :param data: Vector of data storage
+    :param code: Vector of code storage
+    :param ram: Vector of RAM
+    :return: Vector of 1 where memory is present and 0 otherwise
+    """
+    return np.where(data + code + ram > 0, 1., 0.)
+
+
+def power_metric_array(discharge, power, batt_required):
+    """
+    Array version of nsga.power_metric
+    :param discharge: Vector of battery discharge times
+    :param power: Vector of the maximum power usage
+    :param batt_required: A bool value decided for a whole population
+    :return: Vector of power metrics
+    """
+    with np.errstate(over='ignore'):
+        penalty = np.where(power < 0, np.exp(-power) - 1, 0)
+    metric = 1 - penalty
+    if batt_required:
+        metric = np.where(discharge > 0, metric, metric / 2)
+    return metric
+
+
+def br_metric_array(bit_rate):
+    """
+    Array version of components.calculate_br_down_metric and calculate_br_up_metric, which share their formula
+    :param bit_rate: Vector of bit rates
+    :return: Vector of normalised values in the range [0, 1]
+    """
+    bit_rate = np.where(bit_rate < 1, 1, bit_rate)
+    min_baud = 1200
+    max_baud = 38400
+
+    num = np.log(bit_rate) - np.log(min_baud)
+    den = np.log(max_baud) - np.log(min_baud)
+
+    return np.clip(num / den + 0.1, 0, 1)
+
+
+def wavelength_metric_array(wavelength_min, wavelength_max):
+    """
+    Array version of components.calculate_wavelength_metric
+    :param wavelength_min: Vector of minimum detectable wavelengths
+    :param wavelength_max: Vector of maximum detectable wavelengths
+    :return: Vector of wavelength metrics
+    """
+    length_max = np.log(550) * 2
+    wavelength = np.abs(wavelength_max + wavelength_min) / 2
+    with np.errstate(divide='ignore'):
+        log_wl = np.log(wavelength)
+    scaled_met = 1.75 * (log_wl / length_max - 0.5) + 0.5
+    return np.where(wavelength == 0, 0, np.clip(scaled_met, 10e-11, 1))
+
+
+def att_moment_metric_array(mass, att_moment):
+    """
+    Array version of nsga.att_moment_metric
+    :param mass: Vector of satellite masses
+    :param att_moment: Vector of attitude control moments
+    :return: Vector of attitude moment metrics
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.clip(1.25 * (att_moment / mass), 0, 1)
+
+
+def att_know_metric_array(att_knowledge):
+    """
+    Array version of nsga.att_know_metric, the tiers are counted by repeated division so they are identical to the
+    scalar version
+    :param att_knowledge: Vector of attitude knowledge accuracies
+    :return: Vector of attitude knowledge metrics
+    """
+    known = ~(att_knowledge < 10e-5)
+    with np.errstate(divide='ignore'):
+        modded_know = np.where(known, 18 / np.where(known, att_knowledge, 1), 0)
+
+    cr_tiers = np.where(modded_know > 0.75, modded_know, 0)
+    cr_tiers[modded_know == 1] = 1
+    remainder = np.zeros(len(modded_know))
+
+    over = modded_know > 1
+    tiered = modded_know[over]
+    tiers = np.ones(len(tiered))
+    dividing = tiered > 1
+    while dividing.any():
+        tiers[dividing] += 1
+        tiered[dividing] /= 3
+        dividing = tiered > 1
+    cr_tiers[over] = tiers
+    remainder[over] = np.where(tiered != 1, np.mod(1 - tiered, 3), 0)
+
+    cr_gap_distance = 1 / 6
+    return np.where(known, np.clip(cr_tiers * cr_gap_distance - remainder * cr_gap_distance, 0, 1), 0)
+
+
+class EvaluationCache:
+    """
+    A size bounded cache of satellite metrics keyed by the canonical genome, see genome_key. When full, the least
+    recently used entry is evicted. The hit and miss counters are kept so they can be reported each generation
+    """
+    def __init__(self, max_size):
+        """
+        Creates an empty cache
+        :param max_size: The maximum number of satellites held in the cache
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Retrieves the metrics for a genome, marking it as recently used
+        :param key: The genome key
+        :return: The metrics, or None if the genome is not in the cache
+        """
+        metrics = self.entries.get(key)
+        if metrics is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return metrics
+
+    def put(self, key, metrics):
+        """
+        Stores the metrics for a genome, evicting the least recently used entries when full. A copy is stored, so a row
+        of a larger metrics matrix does not keep the whole matrix alive, nor share its memory with the satellites
+        :param key: The genome key
+        :param metrics: The metrics vector of the genome
+        """
+        self.entries[key] = np.array(metrics, dtype=np.float64)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def reset_counters(self):
+        """
+        Resets the hit and miss counters, returning their values
+        :return: hits, misses
+        """
+        counts = self.hits, self.misses
+        self.hits = 0
+        self.misses = 0
+        return counts
+
+
+def genome_key(satellite):
+    """
+    Creates the canonical genome of a satellite dict, the order the components were added in does not change the metrics
+    so they are sorted
+    :param satellite: An ID based satellite dict
+    :return: Hashable tuple of the structure, sorted components and panel pair
+    """
+    return satellite['Structure'], tuple(sorted(satellite['Components'])), tuple(satellite['Panels'][0])
+
+
+class ParallelEvaluator:
+    """
+    Evaluates populations across a pool of worker processes. Each worker receives the catalogue once when it starts,
+    after which only the IDs of each shard are sent to it. Populations smaller than min_parallel are evaluated in the
+    calling process, where the cost of sending them would outweigh the work
+    """
+    def __init__(self, catalogue, workers=None, min_parallel=PARALLEL_MIN_SIZE):
+        """
+        Starts the worker processes
+        :param catalogue: The compiled catalogue, sent to every worker
+        :param workers: The number of worker processes, defaults to the number of CPUs
+        :param min_parallel: The smallest population that is split across the workers
+        """
+        self.catalogue = catalogue
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel = min_parallel
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initialise_worker,
+                                            initargs=(catalogue,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def evaluate(self, population):
+        """
+        Calculates the metrics for every satellite in the population, the Population's metrics array is updated in place
+        :param population: A population.Population
+        :return: The metrics matrix, number of satellites by 10
+        """
+        population.metrics[:] = self.evaluate_genomes(population.structure, population.panels, population.components,
+                                                      population.num_components)
+        return population.metrics
+
+    def evaluate_satellites(self, satellites):
+        """
+        Calculates the metrics for a list of satellite dicts, their genomes are packed into ID arrays before being sent
+        :param satellites: list of ID based satellite dicts
+        :return: The metrics matrix, one row per satellite
+        """
+        genomes = [(satellite['Structure'], satellite['Components'], satellite['Panels'][0])
+                   for satellite in satellites]
+        return self.evaluate_genomes(*pack_genomes(genomes))
+
+    def evaluate_genomes(self, structure, panels, components, num_components):
+        """
+        Calculates the metrics of packed genomes, see evaluate_genomes. Each worker is sent a slice of the ID arrays
+        :return: The metrics matrix, one row per genome
+        """
+        if len(structure) < self.min_parallel or self.workers < 2:
+            return evaluate_genomes(structure, panels, components, num_components, self.catalogue)
+
+        futures = []
+        for shard in np.array_split(np.arange(len(structure)), self.workers):
+            width = max(int(num_components[shard].max()), 1)
+            futures.append(self.executor.submit(evaluate_shard, structure[shard], panels[shard],
+                                                components[shard, :width], num_components[shard]))
+        return np.concatenate([future.result() for future in futures])
+
+    def shutdown(self):
+        """
+        Stops the worker processes
+        """
+        self.executor.shutdown()
+
+
+def initialise_worker(catalogue):
+    """
+    Stores the catalogue in a worker process, run once as each worker starts
+    :param catalogue: The compiled catalogue
+    """
+    global worker_catalogue
+    worker_catalogue = catalogue
+
+
+def evaluate_shard(structure, panels, components, num_components):
+    """
+    Evaluates a shard of a population within a worker process, see evaluate_genomes
+    :return: The metrics matrix of the shard
+    """
+    return evaluate_genomes(structure, panels, components, num_components, worker_catalogue)
+
+
+def pack_genomes(genomes):
+    """
+    Packs satellite genomes into the ID arrays taken by evaluate_genomes
+    :param genomes: list of structure, components and panel pair tuples, the components a list of IDs
+    :return: The structure vector, panels matrix, components matrix padded with EMPTY_SLOT and number of components
+    """
+    structure = np.array([genome[0] for genome in genomes], dtype=np.int64)
+    panels = np.array([genome[2] for genome in genomes], dtype=np.int64).reshape(-1, 2)
+    num_components = np.array([len(genome[1]) for genome in genomes], dtype=np.int64)
+    width = max(int(num_components.max(initial=0)), 1)
+    components = np.full((len(genomes), width), EMPTY_SLOT, dtype=np.int64)
+    components[np.arange(width) < num_components[:, None]] = np.fromiter(
+        chain.from_iterable(genome[1] for genome in genomes), dtype=np.int64, count=int(num_components.sum()))
+    return structure, panels, components, num_components
@@ -1,44 +1,13 @@
 __author__ = "Aidan O'Brien"
 
 
-from nsga import *
-import time
+import os
+from sweep import run_sweep
 import utils
 
 if __name__ == "__main__":
-    targets = np.array([[0.334, 0.167, 0.2667, 0.167, 0.5],
-                        [0.334, 0.167, 0.5, 0.167, 0.5],
-                        [0.334, 0.167, 0.334, 0.167, 0.5],
-                        [0.334, 0.167, 0.2667, 10e-11, 0.5],
-                        [0.334, 0.167, 0.5, 10e-11, 0.5],
-                        [0.334, 0.167, 0.334, 10e-11, 0.5]])
-
-    tests = targets.shape[0]
-
-    for i in range(tests):
-        print(targets[i, :])
-        t = time.time()
-        final_pop, perf, mets_perf = genetic_algorithm(100, 100, 0.3, targets[i, :])
-        elapsed_time = time.time() - t
-        print('Elapsed Time: ' + str(elapsed_time) + 's')
-        utils.save_pop_data(final_pop, '\\experiment_three\\test' + str(i), perf, mets_perf)
-        final_pop = utils.sort_population(final_pop)
-        utils.save_pop_data(final_pop, '\\experiment_three\\test_sorted_' + str(i), perf, mets_perf)
-        # performance = utils.load_exp_performance('\\experiment_one\\test' + str(i))
-
-    targets = np.array([[0.5, 0.5, 0.265, 0.667, 0.5],
-                        [0.667, 0.167, 0.265, 0.667, 0.5],
-                        [0.5, 0.5, 0.265, 0.87, 0.5],
-                        [0.667, 0.167, 0.265, 0.87, 0.5]])
-
-    tests = targets.shape[0]
-
-    for i in range(tests):
-        print(targets[i, :])
-        t = time.time()
-        final_pop, perf, mets_perf = genetic_algorithm(100, 100, 0.3, targets[i, :])
-        elapsed_time = time.time() - t
-        print('Elapsed Time: ' + str(elapsed_time) + 's')
-        utils.save_pop_data(final_pop, '\\experiment_two\\test' + str(i), perf, mets_perf)
-        final_pop = utils.sort_population(final_pop)
-        utils.save_pop_data(final_pop, '\\experiment_two\\test_sorted_' + str(i), perf, mets_perf)
\ No newline at end of file
+    # The targets and parameters of the experiment are in its sweep config, see the sweep module. The results are
+    # saved in the experiments directory, as utils.load_exp_performance expects
+    run_sweep(os.path.join('sweeps', 'experiment_three.json'), path=utils.EXP_PATH)
+    # The targets of experiment two are run again, as they always were, rather than reusing its earlier results
+    run_sweep(os.path.join('sweeps', 'experiment_two.json'), path=utils.EXP_PATH, rerun=True)
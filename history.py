@@ -0,0 +1,74 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module records the performance of the genetic algorithm over its generations. The arrays are preallocated for the
+expected number of generations and doubled if more are recorded, rather than stacking a new row onto a copy each time.
+"""
+
+import numpy as np
+
+
+class GenerationHistory:
+    """
+    A history of the per generation performance, the maximum number of zero distances, the average distance and the
+    minimum distance, alongside the average of each fitness metric
+    """
+    def __init__(self, generations, num_metrics=10):
+        """
+        Allocates the history
+        :param generations: The expected number of generations, more can be recorded
+        :param num_metrics: The number of fitness metrics averaged each generation
+        """
+        self.length = 0
+        self.performance_data = np.full((max(generations, 1), 3), np.nan)
+        self.metric_performance_data = np.full((max(generations, 1), num_metrics), np.nan)
+
+    def __len__(self):
+        return self.length
+
+    def record(self, max_zeros, average_dist, min_dist, metric_perfs):
+        """
+        Records the performance of a generation
+        :param max_zeros: The maximum number of zero distances
+        :param average_dist: The average total distance of the population
+        :param min_dist: The minimum total distance of the population
+        :param metric_perfs: The average of each fitness metric
+        """
+        if self.length == len(self.performance_data):
+            self.performance_data = grow(self.performance_data)
+            self.metric_performance_data = grow(self.metric_performance_data)
+
+        self.performance_data[self.length] = max_zeros, average_dist, min_dist
+        self.metric_performance_data[self.length] = metric_perfs
+        self.length += 1
+
+    @property
+    def perf(self):
+        """
+        The performance of each recorded generation, as returned by nsga.genetic_algorithm, generations with any
+        undefined value are left out
+        :return: numpy array of generations by 3
+        """
+        performance_data = self.performance_data[:self.length]
+        return performance_data[~np.isnan(performance_data).any(1)]
+
+    @property
+    def met_perf(self):
+        """
+        The average fitness metrics of each recorded generation, as returned by nsga.genetic_algorithm, the first row is
+        the undefined starting row
+        :return: numpy array of generations + 1 by the number of metrics
+        """
+        start = np.full((1, self.metric_performance_data.shape[1]), np.nan)
+        return np.vstack((start, self.metric_performance_data[:self.length]))
+
+
+def grow(data):
+    """
+    Doubles the number of rows in a history array, the new rows are undefined
+    :param data: numpy array
+    :return: The larger numpy array, starting with a copy of data
+    """
+    grown = np.full((2 * len(data), data.shape[1]), np.nan)
+    grown[:len(data)] = data
+    return grown
@@ -0,0 +1,174 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module runs the genetic algorithm as an island model. Each island evolves its own population in a separate process
+and every few generations sends copies of its best satellites to its neighbouring islands, where they replace the worst.
+The islands only wait on their neighbours when migrating, rather than on every island each generation.
+"""
+
+import multiprocessing
+
+import numpy as np
+
+import nsga
+from evaluation import EvaluationCache
+from history import GenerationHistory
+
+TOPOLOGIES = ('ring', 'fully connected')
+
+
+def island_genetic_algorithm(generations, pop_size, mut_rate, target_reqs, islands,
+                             migration_interval=nsga.MIGRATION_INTERVAL, migrants=nsga.MIGRANTS, topology='ring',
+                             cache_size=nsga.EVAL_CACHE_SIZE, ranking='heuristic', operators='list', seed=None,
+                             verbose=True):
+    """
+    Runs the genetic algorithm across a number of islands, one process each
+    :param generations: The number of generations each island runs for
+    :param pop_size: The size of the population on each island, a minimum of 15
+    :param mut_rate: The chance of mutating each child satellite
+    :param target_reqs: The customer requirements to evolve towards
+    :param islands: The number of islands
+    :param migration_interval: The number of generations between migrations
+    :param migrants: The number of satellites each island sends to each of its neighbours
+    :param topology: 'ring' sends to the next island only, 'fully connected' sends to every other island
+    :param cache_size: The number of evaluated genomes kept by each island, 0 disables the caches
+    :param ranking: The ranking strategy, see nsga.calculate_rankings
+    :param operators: The genetic operators, see nsga.genetic_algorithm
+    :param seed: The seed of the random numbers, each island has its own stream spawned from it. None seeds from the
+    operating system
+    :param verbose: Whether to print the progress of each generation
+    :return: The final populations of every island ranked together, the performance of each generation and the metric
+    averages of each generation, combined over the islands
+    """
+    pop_size = max(pop_size, 15)
+    neighbours = island_neighbours(islands, topology)
+    migrants = min(migrants, pop_size // max(len(neighbours[0]), 1))
+
+    # Each island has an independent random stream, so a seeded run can be repeated
+    seeds = np.random.SeedSequence(seed).spawn(islands)
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_island,
+                                         args=(island, seeds[island], generations, pop_size, mut_rate, target_reqs,
+                                               cache_size, ranking, operators, verbose, migration_interval,
+                                               migrants, neighbours, inboxes, results))
+                 for island in range(islands)]
+    for process in processes:
+        process.start()
+
+    # The results are collected before joining, a process can not exit while its queued data is unread
+    finished = sorted((results.get() for _ in range(islands)), key=lambda result: result[0])
+    for process in processes:
+        process.join()
+
+    population = [satellite for _, island_pop, _ in finished for satellite in island_pop]
+    population, _ = nsga.calculate_rankings(population, ranking)
+    history = merge_histories([island_history for _, _, island_history in finished])
+    population = [nsga.catalogue.name_satellite(satellite) for satellite in population]
+    return population, history.perf, history.met_perf
+
+
+def island_neighbours(islands, topology):
+    """
+    Finds the islands each island sends its migrants to
+    :param islands: The number of islands
+    :param topology: One of TOPOLOGIES
+    :return: list of the neighbouring islands of each island
+    """
+    if topology == 'ring':
+        return [[(island + 1) % islands] if islands > 1 else [] for island in range(islands)]
+    elif topology == 'fully connected':
+        return [[other for other in range(islands) if other != island] for island in range(islands)]
+    raise ValueError('Unknown island topology: ' + str(topology))
+
+
+def run_island(island, seed, generations, pop_size, mut_rate, target_reqs, cache_size, ranking, operators, verbose,
+               migration_interval, migrants, neighbours, inboxes, results):
+    """
+    Runs the genetic algorithm on a single island, within its own process. The final population and history are put on
+    the results queue
+    :param island: The number of this island
+    :param seed: The numpy SeedSequence of the random stream of this island
+    :param neighbours: The neighbours of every island, from island_neighbours
+    :param inboxes: The migration queue of every island
+    :param results: The queue collecting the result of each island
+    """
+    rng = np.random.default_rng(seed)
+    cache = EvaluationCache(cache_size) if cache_size else None
+    senders = [other for other in range(len(neighbours)) if island in neighbours[other]]
+
+    # Migrants which arrive ahead of the migration they belong to
+    pending = []
+
+    population = nsga.create_population(pop_size, rng)
+    history = GenerationHistory(generations)
+
+    for i in range(generations):
+        if verbose:
+            print("Island %d starting generation: %d" % (island, i))
+        population, max_zeros, _, _ = nsga.evolve_generation(population, pop_size, mut_rate, target_reqs, cache,
+                                                             ranking, None, operators, rng, verbose)
+        average_dist, min_dist, metric_perfs = nsga.performance(population)
+        history.record(max_zeros, average_dist, min_dist, metric_perfs)
+
+        if migrants and senders and (i + 1) % migration_interval == 0 and i < generations - 1:
+            population = migrate(population, island, i, migrants, neighbours[island], senders, inboxes,
+                                 pending)
+
+    results.put((island, population, history))
+
+
+def migrate(population, island, generation, migrants, neighbours, senders, inboxes, pending):
+    """
+    Sends copies of the best satellites of an island to its neighbours, then waits for the migrants of the same
+    generation from the islands sending to it. The arrivals replace the worst satellites and take over their ranks
+    :param population: The ranked population of the island
+    :param island: The number of this island
+    :param generation: The generation just completed
+    :param migrants: The number of satellites sent to each neighbour
+    :param neighbours: The islands this island sends to
+    :param senders: The islands sending to this island
+    :param inboxes: The migration queue of every island
+    :param pending: The early arrivals of later migrations, updated in place
+    :return: The population with the arrivals in place of the worst satellites
+    """
+    by_rank = sorted(range(len(population)), key=lambda j: population[j]['Rank'])
+    best = [population[j] for j in by_rank[:migrants]]
+    for neighbour in neighbours:
+        inboxes[neighbour].put((generation, island, best))
+
+    # Islands run at different speeds, so arrivals from a later migration are kept for then. Arrivals are ordered by
+    # sender so the result does not depend on the timing of the processes
+    arrivals = dict((message[1], message[2]) for message in pending if message[0] == generation)
+    pending[:] = [message for message in pending if message[0] != generation]
+    while len(arrivals) < len(senders):
+        message = inboxes[island].get()
+        if message[0] == generation:
+            arrivals[message[1]] = message[2]
+        else:
+            pending.append(message)
+
+    arrived = [satellite for sender in sorted(arrivals) for satellite in arrivals[sender]]
+    for j, satellite in zip(reversed(by_rank), arrived):
+        satellite = dict(satellite)
+        satellite['Rank'] = population[j]['Rank']
+        population[j] = satellite
+    return population
+
+
+def merge_histories(histories):
+    """
+    Combines the histories of the islands, taking the largest number of zero distances, the mean average distance, the
+    smallest minimum distance and the mean metric averages of each generation
+    :param histories: list of history.GenerationHistory, all the same length
+    :return: The combined GenerationHistory
+    """
+    length = min(len(history) for history in histories)
+    performance_data = np.array([history.performance_data[:length] for history in histories])
+    metric_data = np.array([history.metric_performance_data[:length] for history in histories])
+
+    merged = GenerationHistory(length, metric_data.shape[2])
+    for i in range(length):
+        merged.record(np.max(performance_data[:, i, 0]), np.mean(performance_data[:, i, 1]),
+                      np.min(performance_data[:, i, 2]), np.mean(metric_data[:, i], axis=0))
+    return merged
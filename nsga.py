@@ -5,27 +5,49 @@ This module contains all the main code for the genetic algorithm component. It r
 Algorithm-II, NSGA2, to evolve the development of the population.
 """
 
-import random
 from components import structures
 from components import components as compos
 from components import panels
 from components import calculate_cpu_metric
 from components import calculate_br_down_metric, calculate_br_up_metric, calculate_wavelength_metric
+from catalogue import Catalogue, parse_values
+from population import Population, duplicate_genomes
+from evaluation import evaluate_population, EvaluationCache, ParallelEvaluator, genome_key
+from ranking import nsga2_order, non_dominated_sort
+from operators import batch_child_population, mutate_population
+from history import GenerationHistory
+from checkpoint import load_checkpoint
+from collections import namedtuple
 
-# from components import parse_component
 import numpy as np
-import pandas as pd
 
-MAX_RANDOM_SEARCHES = 10
+EVAL_CACHE_SIZE = 20000
+# The number of times a duplicate child is mutated again before it is dropped
+DEDUP_ATTEMPTS = 3
+# The distance the wavelength metric can be from its goal and still be considered as reaching it
+WAVELENGTH_LEEWAY = 0.005
+# The objectives measured by nearest_distance rather than good_enough_distance, only the wavelength
+NEAREST_OBJECTIVES = np.array([False, False, False, False, False, False, False, False, True, False])
 SIDE_PANELS_TOTAL = 7
+# The number of generations between island migrations, and the number of satellites sent to each neighbour
+MIGRATION_INTERVAL = 10
+MIGRANTS = 2
 NUM_OF_COMPONENTS = len(compos) - 1
 NUM_OF_STRUCTURES = len(structures) - 1
 
+# The compiled catalogue, every satellite refers to its structure, components and panels by their IDs within it
+catalogue = Catalogue(structures, compos, panels, SIDE_PANELS_TOTAL)
 
-def create_population(pop_size):
+# The progress of a single generation, as yielded by iterate_genetic_algorithm
+GenerationRecord = namedtuple('GenerationRecord', ['generation', 'max_zeros', 'average_dist', 'min_dist',
+                                                   'metric_perfs', 'front', 'duplicate_rate'])
+
+
+def create_population(pop_size, rng=None):
     """
     This is a function utilised to create the initial population
     :param pop_size: Determines how large a sample of population should be created
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
     :return: Returns 2D array of potential satellite configurations, 1 dimension is the satellites, the second is the
      components that make up the satellite
     """
@@ -34,42 +56,24 @@ def create_population(pop_size):
     # Gather the number of possible types of structures, this changes with the db and create a vector of the randomly
     # generated structures to utilise
 
-    structures_pop = [random.randint(0, NUM_OF_STRUCTURES) for _ in range(pop_size)]
+    rng = np.random.default_rng(rng)
+    structures_pop = rng.integers(0, NUM_OF_STRUCTURES + 1, size=pop_size).tolist()
+    side_panels = rng.integers(0, SIDE_PANELS_TOTAL, size=pop_size).tolist()
+    end_panels = rng.integers(SIDE_PANELS_TOTAL, catalogue.num_panels, size=pop_size).tolist()
     population = []
     for i in range(pop_size):
-        satellite = {'Structure': structures['Name'][structures_pop[i]],
+        satellite = {'Structure': structures_pop[i],
                      'Components': [],
                      'Panels': [],
                      'Metrics': np.array([], ndmin=1),
                      'Fitness': np.array([], ndmin=1),
-                     'Details': np.array([structures['Internal Slots'][structures_pop[i]],
-                                          structures['Internal Slots'][structures_pop[i]],
-                                          structures['External Slots'][structures_pop[i]],
-                                          structures['External Slots'][structures_pop[i]]], ndmin=1)}
-
-        available_slots = satellite['Details'][1]
-        avail_ext_slots = satellite['Details'][3]
-        under_one = MAX_RANDOM_SEARCHES
-        while available_slots > 0:
-            component_num = random.randint(0, NUM_OF_COMPONENTS)
-            component = compos['Name'][component_num]
-            if available_slots + compos['Internal Slots'][component_num] > 0 \
-                    and avail_ext_slots + compos['External Slots'][component_num] > 0:
-                satellite['Components'].append(component)
-                satellite['Details'][1] += compos['Internal Slots'][component_num]
-                satellite['Details'][3] += compos['External Slots'][component_num]
-            available_slots = satellite['Details'][1]
-            avail_ext_slots = satellite['Details'][3]
-
-            if 0 < available_slots < 1:
-                under_one -= 1
-
-            if under_one < 1:
-                available_slots = 0
-
-        side_panel = panels['Name'][random.randint(0, SIDE_PANELS_TOTAL-1)]
-        end_panel = panels['Name'][random.randint(SIDE_PANELS_TOTAL, len(panels) - 1)]
-        satellite['Panels'].append([side_panel, end_panel])
+                     'Details': np.array([catalogue.structure_internal[structures_pop[i]],
+                                          catalogue.structure_internal[structures_pop[i]],
+                                          catalogue.structure_external[structures_pop[i]],
+                                          catalogue.structure_external[structures_pop[i]]], ndmin=1)}
+
+        fill_satellite(satellite, rng=rng)
+        satellite['Panels'].append([side_panels[i], end_panels[i]])
 
         # Append the current satellite to the population
         population.append(satellite)
@@ -79,10 +83,11 @@ def create_population(pop_size):
     return population
 
 
-def create_child_population(population):
+def create_child_population(population, rng=None):
     """
     This function takes the parent population and creates a population of the same size via combination and
     :param population: 2D array of the same type created in the create_population function
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
     :return: Returns a 2D array of the same type as create population
     """
     c_pop = []
@@ -95,6 +100,9 @@ def create_child_population(population):
     else:
         spare = []
 
+    rng = np.random.default_rng(rng)
+    # Whether each pair keeps or swaps their panels
+    swap_panels = (rng.random(len(pop_a)) >= 0.5).tolist()
     # Length of pop_a and pop_b will be the same
     # Could refactor the internals of this loop out into dedicated functions, but task for later
     for i in range(len(pop_a)):
@@ -123,91 +131,13 @@ def create_child_population(population):
         for comp in pop_b[i]['Components']:
             comps.append(comp)
 
-        # Retrieve the number of available slots for each structure
-        slots_a = sat_a['Details'][0]
-        ext_slots_a = sat_a['Details'][2]
-        slots_b = sat_b['Details'][0]
-        ext_slots_b = sat_b['Details'][2]
-
-        under_one = MAX_RANDOM_SEARCHES
-
-        while slots_a > 0:
-            if comps:
-                component = comps.pop(random.randint(0, len(comps) - 1))
-                component_num = np.where(compos['Name'] == component)[0][0]
-
-                if slots_a + compos['Internal Slots'][component_num] > 0 \
-                        and ext_slots_a + compos['External Slots'][component_num] > 0:
-                    sat_a['Components'].append(component)
-                    sat_a['Details'][1] += compos['Internal Slots'][component_num]
-                    sat_a['Details'][3] += compos['External Slots'][component_num]
-
-                slots_a = sat_a['Details'][1]
-                ext_slots_a = sat_a['Details'][3]
-
-                # Less than one counter
-                if 0 < slots_a < 1:
-                    under_one -= 1
-
-                if under_one < 1:
-                    slots_a = 0
-            else:
-                component_num = random.randint(0, NUM_OF_COMPONENTS)
-                component = compos['Name'][component_num]
-                if slots_a + compos['Internal Slots'][component_num] > 0 \
-                        and ext_slots_a + compos['External Slots'][component_num] > 0:
-                    sat_a['Components'].append(component)
-                    sat_a['Details'][1] += compos['Internal Slots'][component_num]
-                    sat_a['Details'][3] += compos['External Slots'][component_num]
-
-                slots_a = sat_a['Details'][1]
-                ext_slots_a = sat_a['Details'][3]
-                if 0 < slots_a < 1:
-                    under_one -= 1
-
-                if under_one < 1:
-                    slots_a = 0
-        # Repeat for sat_b
-        under_one = MAX_RANDOM_SEARCHES
-        while slots_b > 0:
-            if comps:
-                component = comps.pop(random.randint(0, len(comps) - 1))
-                component_num = np.where(compos['Name'] == component)[0][0]
-
-                if slots_b + compos['Internal Slots'][component_num] > 0 \
-                        and ext_slots_b + compos['External Slots'][component_num] > 0:
-                    sat_b['Components'].append(component)
-                    sat_b['Details'][1] += compos['Internal Slots'][component_num]
-                    sat_b['Details'][3] += compos['External Slots'][component_num]
-
-                slots_b = sat_b['Details'][1]
-                ext_slots_b = sat_b['Details'][3]
-
-                # Less than one counter
-                if 0 < slots_b < 1:
-                    under_one -= 1
-
-                if under_one < 1:
-                    slots_b = 0
-            else:
-                component_num = random.randint(0, NUM_OF_COMPONENTS)
-                component = compos['Name'][component_num]
-                if slots_b + compos['Internal Slots'][component_num] > 0 \
-                        and ext_slots_b + compos['External Slots'][component_num] > 0:
-                    sat_b['Components'].append(component)
-                    sat_b['Details'][1] += compos['Internal Slots'][component_num]
-                    sat_b['Details'][3] += compos['External Slots'][component_num]
-
-                slots_b = sat_b['Details'][1]
-                ext_slots_b = sat_b['Details'][3]
-                if 0 < slots_b < 1:
-                    under_one -= 1
-
-                if under_one < 1:
-                    slots_b = 0
+        # Fill sat_a from the combined components in a random order, then sat_b from those left over
+        comps = [comps[k] for k in rng.permutation(len(comps))]
+        fill_satellite(sat_a, comps, rng)
+        fill_satellite(sat_b, comps, rng)
 
         # Randomly select external panels
-        if random.randint(0, 1) == 0:
+        if not swap_panels[i]:
             sat_a['Panels'] = pop_a[i]['Panels']
             sat_b['Panels'] = pop_b[i]['Panels']
         else:
@@ -224,74 +154,84 @@ def create_child_population(population):
     return c_pop
 
 
-def mutate_satellite(satellite, structure_mut_rate):
+def mutate_satellite(satellite, structure_mut_rate, rng=None):
     """
     This function mutates a satellite by generating a new component for the satellite and then filling up the spare
     space with the previous components, dropping the remainder. If a new structure is generated, it fills up the
     available space with previous components and then fills up the remainder with randomly retrieved components
     :param satellite: The satellite to be mutated
     :param structure_mut_rate: The chance that the component to be mutated is the structure
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
     :return: The mutated satellite
     """
-
-    if random.random() < structure_mut_rate:
+    rng = np.random.default_rng(rng)
+    if rng.random() < structure_mut_rate:
         # Structure is mutated
-        structure_num = random.randint(0, NUM_OF_STRUCTURES)
-        satellite['Structure'] = structures['Name'][structure_num]
-        satellite['Details'] = np.array([structures['Internal Slots'][structure_num],
-                                         structures['Internal Slots'][structure_num],
-                                         structures['External Slots'][structure_num],
-                                         structures['External Slots'][structure_num]], ndmin=1)
-        new_comp = []
+        structure_num = int(rng.integers(0, NUM_OF_STRUCTURES + 1))
+        satellite['Structure'] = structure_num
+        satellite['Details'] = np.array([catalogue.structure_internal[structure_num],
+                                         catalogue.structure_internal[structure_num],
+                                         catalogue.structure_external[structure_num],
+                                         catalogue.structure_external[structure_num]], ndmin=1)
+        new_comp = None
     else:
-        new_comp = compos['Name'][random.randint(0, NUM_OF_COMPONENTS)]
+        new_comp = int(rng.integers(0, NUM_OF_COMPONENTS + 1))
     comps = satellite['Components']
-    if new_comp:
+    if new_comp is not None:
         comps.append(new_comp)
 
     satellite['Components'] = []
-    available_slots = satellite['Details'][0]
     satellite['Details'][1] = satellite['Details'][0]
-    avail_ext_slots = satellite['Details'][2]
     satellite['Details'][3] = satellite['Details'][2]
-    under_one = MAX_RANDOM_SEARCHES
-    while available_slots > 0:
+    fill_satellite(satellite, comps, rng)
+
+    # Clearing the metrics, since they will be different
+    satellite['Metrics'] = np.array([], ndmin=1)
+    return satellite
+
+
+def fill_satellite(satellite, comps=None, rng=None):
+    """
+    This function fills the available slots of a satellite, first from the given components and then with random
+    components. The given components that no longer fit are dropped, while the random components are only drawn from
+    those that fit. The filling stops once no component fitting the satellite would take up an internal slot
+    :param satellite: The satellite to be filled, its details give the available slots
+    :param comps: list of components to use first, taken from the end of the list, those used or dropped are removed
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: The filled satellite
+    """
+    rng = np.random.default_rng(rng)
+    while satellite['Details'][1] > 0:
         if comps:
             component = comps.pop()
-            component_num = np.where(compos['Name'] == component)[0][0]
-            if available_slots + compos['Internal Slots'][component_num] > 0 \
-                    and avail_ext_slots + compos['External Slots'][component_num] > 0:
-                satellite['Components'].append(component)
-                satellite['Details'][1] += compos['Internal Slots'][component_num]
-                satellite['Details'][3] += compos['External Slots'][component_num]
-            available_slots = satellite['Details'][1]
-            avail_ext_slots = satellite['Details'][3]
-            if 0 < available_slots < 1:
-                under_one -= 1
-
-            if under_one < 1:
-                available_slots = 0
+            if satellite['Details'][1] + catalogue.component_internal[component] <= 0 \
+                    or satellite['Details'][3] + catalogue.component_external[component] <= 0:
+                continue
         else:
-            component_num = random.randint(0, NUM_OF_COMPONENTS)
-            component = compos['Name'][component_num]
-            if available_slots + compos['Internal Slots'][component_num] > 0 \
-                    and avail_ext_slots + compos['External Slots'][component_num] > 0:
-                satellite['Components'].append(component)
-                satellite['Details'][1] += compos['Internal Slots'][component_num]
-                satellite['Details'][3] += compos['External Slots'][component_num]
-            available_slots = satellite['Details'][1]
-            avail_ext_slots = satellite['Details'][3]
-
-            if 0 < available_slots < 1:
-                under_one -= 1
-
-            if under_one < 1:
-                available_slots = 0
-    # Clearing the metrics, since they will be different
-    satellite['Metrics'] = np.array([], ndmin=1)
+            component = random_fitting_component(satellite['Details'][1], satellite['Details'][3], rng)
+            if component is None:
+                break
+        satellite['Components'].append(component)
+        satellite['Details'][1] += catalogue.component_internal[component]
+        satellite['Details'][3] += catalogue.component_external[component]
     return satellite
 
 
+def random_fitting_component(available_slots, avail_ext_slots, rng):
+    """
+    This function draws a random component, with equal chance, from those fitting the available slots. The fitting
+    components come from the slot cost groups of the catalogue, so a draw never has to be rejected
+    :param available_slots: The available internal slots
+    :param avail_ext_slots: The available external slots
+    :param rng: numpy random Generator
+    :return: The component ID, or None if no fitting component takes up an internal slot
+    """
+    groups, totals, takes_slot = catalogue.fitting_groups(available_slots, avail_ext_slots)
+    if not takes_slot:
+        return None
+    return catalogue.fitting_component(groups, totals, int(rng.random() * totals[-1]))
+
+
 def population_union(population_one, population_two):
     """
     This function takes two populations and makes a union of the two into a greater cohesive population.
@@ -310,29 +250,15 @@ def calculate_satellite_metrics(satellite):
     :return: The satellite structure with the metrics array calculated
     """
     # print(satellite)
-    size = pd.DataFrame(structures.loc[np.where(structures['Name'] ==
-                                                satellite['Structure'])[0][0]]).T['Size'].values[0]
-    comps = satellite['Components']
-    values = np.array([])
-    for comp in comps:
-        comp_num = np.where(compos['Name'] == comp)[0][0]
-        if not values.any():
-            values = parse_component(pd.DataFrame(compos.loc[comp_num]).T)
-        else:
-            values = np.vstack((values, parse_component(pd.DataFrame(compos.loc[comp_num]).T)))
+    # The raw values are pre-parsed in the catalogue, so they only need to be gathered by ID
+    size = catalogue.structure_size[satellite['Structure']]
+    values = catalogue.component_values[satellite['Components']]
 
     # print(values)
     combined = combine_values(values)
 
-    structure_values = parse_component(pd.DataFrame(structures.loc[np.where(structures['Name']
-                                                                            == satellite['Structure'])[0][0]]).T)
-    panels_values = np.array([])
-    for panel in satellite['Panels'][0]:
-        panel_num = np.where(panels['Name'] == panel)[0][0]
-        if not panels_values.any():
-            panels_values = parse_component(pd.DataFrame(panels.loc[panel_num]).T)
-        else:
-            panels_values = np.vstack((panels_values, parse_component(pd.DataFrame(panels.loc[panel_num]).T)))
+    structure_values = catalogue.structure_values[satellite['Structure']]
+    panels_values = catalogue.panel_values[satellite['Panels'][0]]
 
     raw_values = combine_sections(structure_values, combined, panels_values, size)
     # [mass, max_power, min_wavelength, max_wavelength, detail, br_down, br_up, data, code, ram,
@@ -354,6 +280,54 @@ def calculate_satellite_metrics(satellite):
     return satellite
 
 
+def calculate_population_metrics(population, cache=None, evaluator=None):
+    """
+    This function calculates the metrics for a whole population at once. Where a cache is given, satellites whose
+    genomes have already been evaluated take their metrics from it, and only the unique new genomes are evaluated
+    :param population: A population of satellites
+    :param cache: An optional evaluation.EvaluationCache
+    :param evaluator: An optional evaluation.ParallelEvaluator to spread the evaluation across processes
+    :return: The population with the metrics arrays calculated
+    """
+    if cache is None:
+        metrics = evaluate_satellites(population, evaluator)
+        for j in range(len(population)):
+            population[j]['Metrics'] = metrics[j]
+        return population
+
+    # Group the satellites missing from the cache by genome, so identical children are only evaluated once
+    pending = {}
+    for j in range(len(population)):
+        key = genome_key(population[j])
+        metrics = cache.get(key)
+        if metrics is None:
+            pending.setdefault(key, []).append(j)
+        else:
+            population[j]['Metrics'] = metrics
+
+    if pending:
+        firsts = [population[locs[0]] for locs in pending.values()]
+        metrics = evaluate_satellites(firsts, evaluator)
+        for row, (key, locs) in zip(metrics, pending.items()):
+            cache.put(key, row)
+            for j in locs:
+                population[j]['Metrics'] = row
+
+    return population
+
+
+def evaluate_satellites(satellites, evaluator=None):
+    """
+    Evaluates a list of satellites from their component IDs, in this process or across the workers
+    :param satellites: list of satellites
+    :param evaluator: An optional evaluation.ParallelEvaluator
+    :return: The metrics matrix, one row per satellite
+    """
+    if evaluator is None:
+        return evaluate_population(Population.from_dicts(satellites), catalogue)
+    return evaluator.evaluate_satellites(satellites)
+
+
 def att_know_metric(att_knowledge):
     """
     This calculates the attitude knowledge metric from the given value
@@ -393,31 +367,11 @@ def att_know_metric(att_knowledge):
 def parse_component(component):
     """
     Parses the component utilising values that are required for the genetic algorithm, returning raw values that can be
-    converted into appropriate metrics later
+    converted into appropriate metrics later. The genetic algorithm itself uses the values pre-parsed in the catalogue
     :param component: Pandas series entry for the component
     :return: raw values in a numpy array
     """
-
-    volume = (component['X'] * component['Y'] * component['Z']).values[0]
-    mass = component['Mass'].values[0]
-    nom_power = component['Nom Power'].values[0]
-    max_power = component['Power (W)'].values[0] - nom_power
-    min_wavelength = component['Min Wavelength (nm)'].values[0]
-    max_wavelength = component['Max Wavelength (nm)'].values[0]
-    detail = component['Resolution'].values[0]
-    br_down = component['Bit Rate Down'].values[0]
-    br_up = component['Bit Rate Up'].values[0]
-    data = component['Data Storage (MB)'].values[0]
-    code = component['Code Storage (MB)'].values[0]
-    ram = component['RAM'].values[0]
-    att_know = component['Attitude Know (deg)'].values[0]
-    att_mom = component['Attitude Control moment'].values[0]
-    discharge = component['Discharge Time (Wh)'].values[0]
-    price = component['Price ($US)'].values[0]
-
-    values = np.array([volume, mass, nom_power, max_power, min_wavelength, max_wavelength, detail, br_down, br_up, data,
-                       code, ram, att_know, att_mom, discharge, price])
-    return values
+    return parse_values(component)[0]
 
 
 def combine_values(value_array):
@@ -576,78 +530,400 @@ def att_moment_metric(mass, att_moment):
     return np.float64(1.25 * (att_moment / mass)).clip(min=0, max=1)
 
 
-def genetic_algorithm(generations, pop_size, mut_rate, target_reqs):
+def genetic_algorithm(generations, pop_size, mut_rate, target_reqs, cache_size=EVAL_CACHE_SIZE, ranking='heuristic',
+                      workers=1, islands=1, topology='ring', migration_interval=MIGRATION_INTERVAL,
+                      migrants=MIGRANTS, operators='list', seed=None, stopping=None, checkpoint=None, resume_from=None,
+                      archive=None, dedup=None, steady_state=None, verbose=True):
+    """
+    Runs the genetic algorithm
+    :param generations: The number of generations to run for
+    :param pop_size: The size of the population, a minimum of 15
+    :param mut_rate: The chance of mutating each child satellite
+    :param target_reqs: The customer requirements to evolve towards
+    :param cache_size: The number of evaluated genomes kept between generations, 0 disables the cache
+    :param ranking: The ranking strategy, see calculate_rankings
+    :param workers: The number of processes evaluating the population, a generation with fewer than
+    evaluation.PARALLEL_MIN_SIZE satellites missing from the cache is still evaluated serially. With steady_state the
+    workers breed as well as evaluate the children
+    :param islands: The number of islands, more than 1 runs islands.island_genetic_algorithm with a population of
+    pop_size on each island. Each island is one process, so workers is not supported with islands
+    :param topology: The migration topology between the islands, see islands.island_neighbours
+    :param migration_interval: The number of generations between migrations of the islands
+    :param migrants: The number of satellites each island sends to each of its neighbours
+    :param operators: 'list' creates and mutates the children a satellite at a time, 'batch' uses the array operators
+    of the operators module over the whole population
+    :param seed: The seed of the random numbers, a seeded run gives the same result for any number of workers. None
+    seeds from the operating system
+    :param stopping: A stopping.StoppingCriteria to stop before all the generations are run, the population of the
+    generation it stops at is returned. Not supported with islands
+    :param checkpoint: A checkpoint.Checkpointer to save the state of the run as it goes. Not supported with islands
+    :param resume_from: A checkpoint file to continue a run from, in place of a new population and the seed. The run
+    continues up to the total number of generations, and must have the pop_size, operators and ranking of the run saved
+    :param archive: An archive.ParetoArchive which every evaluated satellite is offered to, it can be queried during
+    and after the run. Not supported with islands
+    :param dedup: What happens to the children repeating the genome of another satellite before they are evaluated,
+    None keeps them, 'drop' removes them and 'mutate' mutates them again, see remove_duplicates. Not supported with
+    islands
+    :param steady_state: 'worst' or 'crowding' runs steady_state.steady_state_genetic_algorithm with that replacement,
+    breeding and evaluating generations * pop_size children across the workers. The performance is recorded every
+    pop_size evaluations. Only workers and seed are supported alongside it, any other option must keep its default
+    :param verbose: Whether to print the progress of each generation
+    :return: The final population, the performance of each generation and the metric averages of each generation
+    """
+    if steady_state is not None:
+        defaults = (cache_size == EVAL_CACHE_SIZE and ranking == 'heuristic' and islands == 1 and topology == 'ring' and
+                    migration_interval == MIGRATION_INTERVAL and migrants == MIGRANTS and operators == 'list')
+        if not defaults or any(option is not None for option in (stopping, checkpoint, resume_from, archive, dedup)):
+            raise ValueError('The steady state genetic algorithm only supports workers and a seed')
+        # Imported here as the steady_state module builds on this one
+        from steady_state import steady_state_genetic_algorithm
+        return steady_state_genetic_algorithm(generations * pop_size, pop_size, mut_rate, target_reqs, steady_state,
+                                              workers, seed=seed, verbose=verbose)[:3]
+
+    if islands > 1:
+        if any(option is not None for option in (stopping, checkpoint, resume_from, archive, dedup)):
+            raise ValueError('Early stopping, checkpoints, archives and deduplication are not supported with islands')
+        if workers > 1:
+            raise ValueError('Each island is a single process, workers are not supported with islands')
+        # Imported here as the islands module builds on this one
+        from islands import island_genetic_algorithm
+        return island_genetic_algorithm(generations, pop_size, mut_rate, target_reqs, islands, migration_interval,
+                                        migrants, topology, cache_size, ranking, operators, seed, verbose)
+
+    records = iterate_genetic_algorithm(generations, pop_size, mut_rate, target_reqs, cache_size, ranking, workers,
+                                        operators, seed, stopping, checkpoint, resume_from, verbose,
+                                        archive=archive, dedup=dedup)
+    while True:
+        try:
+            next(records)
+        except StopIteration as finished:
+            population, history = finished.value
+            break
+
+    # Return the population, with the IDs converted back to names, and generations details.
+    population = [catalogue.name_satellite(satellite) for satellite in population]
+    return population, history.perf, history.met_perf
+
+
+def iterate_genetic_algorithm(generations, pop_size, mut_rate, target_reqs, cache_size=EVAL_CACHE_SIZE,
+                              ranking='heuristic', workers=1, operators='list', seed=None, stopping=None,
+                              checkpoint=None, resume_from=None, verbose=False, front=False, archive=None,
+                              dedup=None):
+    """
+    Runs the genetic algorithm as a generator, yielding a GenerationRecord after each generation. The parameters are as
+    genetic_algorithm, the run stops early if the caller stops iterating
+    :param verbose: Whether to print the progress of each generation
+    :param front: Whether each record holds the non-dominated satellites of the population, with their names
+    :param archive: An archive.ParetoArchive updated with each generation, as genetic_algorithm
+    :param dedup: The handling of duplicate children, as genetic_algorithm
+    :return: The final ID based population and the history.GenerationHistory, as the value of StopIteration
+    """
     if pop_size < 15:
         pop_size = 15
 
-    population = create_population(pop_size)
-
-    # Put a history logging array here
-    performance_data = np.array([np.nan, np.nan, np.nan])
-    metric_performance_data = np.array([np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan])
-
-    for i in range(generations):
-        # if not i % 10:
-        print("Starting generation: " + str(i))
-        # Create a child population
-        child_pop = create_child_population(population)
-
-        # Provide a chance of mutating an individual satellite in the child population
-        # print(len(child_pop))
-        # print(child_pop[19])
-        for j in range(pop_size - 1):
-            if random.random() < mut_rate:
-                # print(j)
-                child_pop[j] = mutate_satellite(child_pop[j], mut_rate)
-
-        # Create the union of the parent and child populations. Size is now 2*pop_size
-        r_pop = population_union(population, child_pop)
-
-        # Calculate the metrics for the satellite
-        for j in range(len(r_pop)):
-            r_pop[j] = calculate_satellite_metrics(r_pop[j])
-            r_pop[j]['ID'] = j
-
-        # Calculate the distances from the desired requirements. The first four are always volume, mass, cpu and power
-        r_pop = calculate_fitness(r_pop, target_reqs)
-
-        # Calculate the rank of all the members within the population, based on the number of zero distances, then the
-        # minimum distances to break ties where the same number of zeros are found. In second tier ties, randomly select
-        # an order. Ensure at least one with a minimum value for each CR limits are always included at the top of the
-        # rankings.
-        pop2, max_zeros = calculate_rankings(r_pop)
+    cache = EvaluationCache(cache_size) if cache_size else None
+    evaluator = ParallelEvaluator(catalogue, workers) if workers > 1 else None
+    # The options a resumed run must share with the run it continues
+    options = {'pop_size': pop_size, 'operators': operators, 'ranking': ranking}
+    try:
+        if resume_from is not None:
+            start, population, history, rng = load_checkpoint(resume_from, generations, options)
+        else:
+            start = 0
+            rng = np.random.default_rng(seed)
+            population = create_population(pop_size, rng)
+
+            # The history is preallocated for all the generations
+            history = GenerationHistory(generations)
+        if stopping is not None:
+            stopping.start()
+
+        for i in range(start, generations):
+            # if not i % 10:
+            if verbose:
+                print("Starting generation: " + str(i))
+            population, max_zeros, evaluations, duplicate_rate = evolve_generation(population, pop_size, mut_rate,
+                                                                                   target_reqs, cache, ranking,
+                                                                                   evaluator, operators, rng, verbose,
+                                                                                   archive, dedup)
+
+            # Calculate and save this generations performance
+            average_dist, min_dist, metric_perfs = performance(population)
+            history.record(max_zeros, average_dist, min_dist, metric_perfs)
+
+            if checkpoint is not None and checkpoint.due(i):
+                checkpoint.save(i + 1, population, history, rng, options)
+
+            yield GenerationRecord(i, max_zeros, average_dist, min_dist, metric_perfs,
+                                   population_front(population) if front else None, duplicate_rate)
+
+            # The parents are always in the union, so the current population is the best found so far
+            reason = stopping.check(history, evaluations) if stopping is not None else None
+            if reason is not None:
+                if verbose:
+                    print("Stopping after generation %d: %s" % (i, reason))
+                break
+
+        return population, history
+    finally:
+        if evaluator is not None:
+            evaluator.shutdown()
+
+
+def population_front(population):
+    """
+    Finds the non-dominated satellites of a population
+    :param population: A population of satellites with the fitness calculated
+    :return: list of the non-dominated satellites, with their names
+    """
+    fronts = non_dominated_sort(np.array([satellite['Fitness'] for satellite in population]))
+    return [catalogue.name_satellite(population[j]) for j in np.where(fronts == 0)[0]]
 
-        # Place the satellites in order of rank into a new population until n == pop_size
-        new_pop = []
 
-        for satellite in pop2:
-            # print(satellite['Rank'])
-            if satellite['Rank'] < pop_size:
-                new_pop.append(satellite)
+def evolve_generation(population, pop_size, mut_rate, target_reqs, cache, ranking, evaluator, operators='list',
+                      rng=None, verbose=True, archive=None, dedup=None):
+    """
+    Runs a single generation of the genetic algorithm, creating the children of the population and selecting the best
+    of the parents and children
+    :param population: The current population, evaluated and ranked unless it is the initial population
+    :param pop_size: The size of the population
+    :param mut_rate: The chance of mutating each child satellite
+    :param target_reqs: The customer requirements to evolve towards
+    :param cache: An evaluation.EvaluationCache or None
+    :param ranking: The ranking strategy, see calculate_rankings
+    :param evaluator: An evaluation.ParallelEvaluator or None
+    :param operators: The genetic operators, see genetic_algorithm
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :param verbose: Whether to print the evaluation cache use and duplicate children
+    :param archive: An archive.ParetoArchive to offer the parents and children to, or None
+    :param dedup: The handling of duplicate children, see remove_duplicates
+    :return: The next population, the maximum number of zero distances, the number of satellites evaluated and the
+    fraction of the children which were duplicates
+    """
+    child_pop = create_children(population, pop_size, mut_rate, operators, rng)
+
+    # Create the union of the parent and child populations. Size is now 2*pop_size
+    r_pop = population_union(population, child_pop)
+
+    # Find the children repeating a genome before they are evaluated, the parents come first so are always kept
+    r_pop, duplicates = remove_duplicates(r_pop, mut_rate, dedup, rng, len(population))
+    duplicate_rate = duplicates / len(child_pop) if child_pop else 0.0
+    if verbose and duplicates:
+        print('Duplicate genomes: %d of %d children' % (duplicates, len(child_pop)))
+
+    # Calculate the metrics for the whole union population at once, the unchanged parents come from the cache
+    r_pop = calculate_population_metrics(r_pop, cache, evaluator)
+    for j in range(len(r_pop)):
+        r_pop[j]['ID'] = j
+    evaluations = len(r_pop)
+    if cache is not None:
+        hits, evaluations = cache.reset_counters()
+        if verbose:
+            print('Evaluation cache hits: %d, misses: %d' % (hits, evaluations))
+
+    # Calculate the distances from the desired requirements. The first four are always volume, mass, cpu and power
+    r_pop = calculate_fitness(r_pop, target_reqs)
+    if archive is not None:
+        archive.insert(r_pop)
+
+    # Calculate the rank of all the members within the population, based on the number of zero distances, then the
+    # minimum distances to break ties where the same number of zeros are found. In second tier ties, randomly select
+    # an order. Ensure at least one with a minimum value for each CR limits are always included at the top of the
+    # rankings.
+    pop2, max_zeros = calculate_rankings(r_pop, ranking)
+
+    # Place the satellites in order of rank into a new population until n == pop_size
+    new_pop = []
+
+    for satellite in pop2:
+        # print(satellite['Rank'])
+        if satellite['Rank'] < pop_size:
+            new_pop.append(satellite)
+
+    return new_pop, max_zeros, evaluations, duplicate_rate
+
+
+def remove_duplicates(population, mut_rate, dedup=None, rng=None, first_child=0):
+    """
+    Finds the children whose canonical genome repeats that of an earlier satellite, see child_duplicates, and handles
+    them before they are evaluated
+    :param population: A population of ID based satellites, the parents followed by the children
+    :param mut_rate: The chance of mutating the structure when a duplicate is mutated again
+    :param dedup: None keeps the duplicates, 'drop' removes them and 'mutate' mutates them again, up to DEDUP_ATTEMPTS
+    times, dropping any which are still duplicates
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :param first_child: The index of the first child, the satellites before it are never counted or removed
+    :return: The population and the number of duplicate children found
+    """
+    duplicates = child_duplicates(population, first_child)
+    count = int(np.sum(duplicates))
+    if dedup is None or not count:
+        return population, count
+    if dedup not in ('drop', 'mutate'):
+        raise ValueError('Unknown deduplication: ' + str(dedup))
+
+    if dedup == 'mutate':
+        rng = np.random.default_rng(rng)
+        population = list(population)
+        for _ in range(DEDUP_ATTEMPTS):
+            for j in np.where(duplicates)[0]:
+                # A copy is mutated, as the satellite may be shared with the parent population
+                satellite = dict(population[j], Components=list(population[j]['Components']),
+                                 Details=population[j]['Details'].copy())
+                population[j] = mutate_satellite(satellite, mut_rate, rng)
+            duplicates = child_duplicates(population, first_child)
+            if not duplicates.any():
+                break
+    return [satellite for satellite, duplicate in zip(population, duplicates) if not duplicate], count
+
+
+def child_duplicates(population, first_child=0):
+    """
+    Finds the children whose canonical genome repeats that of an earlier satellite, see population.duplicate_genomes.
+    A parent carried into the children as itself, the spare of an odd sized population, is not a duplicate
+    :param population: A population of ID based satellites, the parents followed by the children
+    :param first_child: The index of the first child
+    :return: Boolean vector over the population, True for the duplicate children
+    """
+    duplicates = duplicate_genomes(Population.from_dicts(population))
+    duplicates[:first_child] = False
+    parents = set(id(satellite) for satellite in population[:first_child])
+    duplicates[first_child:] &= np.array([id(satellite) not in parents for satellite in population[first_child:]],
+                                         dtype=bool)
+    return duplicates
 
-        # Calculate and save this generations performance
-        average_dist, min_dist, metric_perfs = performance(new_pop)
-        gen_performance = np.array([max_zeros, average_dist, min_dist])
-        performance_data = np.vstack((performance_data, gen_performance))
-        metric_performance_data = np.vstack((metric_performance_data, metric_perfs))
 
-        # Start loop again
-        population = new_pop
+def create_children(population, pop_size, mut_rate, operators='list', rng=None):
+    """
+    Creates the mutated child population of a population
+    :param population: The current population
+    :param pop_size: The size of the population
+    :param mut_rate: The chance of mutating each child satellite
+    :param operators: The genetic operators, see genetic_algorithm
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: The child population
+    """
+    rng = np.random.default_rng(rng)
+    if operators == 'batch':
+        # Create and mutate the child population over the arrays of the whole population, the last child is never
+        # mutated as below
+        children = batch_child_population(Population.from_dicts(population), catalogue, rng)
+        mutable = min(pop_size - 1, len(children))
+        mutate_population(children, mut_rate, catalogue, mutable, rng)
+        children = children.to_dicts()
+        if len(population) % 2 and len(children) > mutable:
+            # The spare parent was not mutated, so it is carried over as itself as in create_child_population
+            children[-1] = population[len(population) // 2]
+        return children
+    elif operators != 'list':
+        raise ValueError('Unknown genetic operators: ' + str(operators))
+
+    # Create a child population
+    child_pop = create_child_population(population, rng)
+
+    # Provide a chance of mutating an individual satellite in the child population
+    # print(len(child_pop))
+    # print(child_pop[19])
+    # The population is smaller than pop_size when duplicates have been dropped
+    for j in np.where(rng.random(min(pop_size - 1, len(child_pop))) < mut_rate)[0]:
+        # print(j)
+        child_pop[j] = mutate_satellite(child_pop[j], mut_rate, rng)
+    return child_pop
+
+
+def multi_target_genetic_algorithm(generations, pop_size, mut_rate, targets, cache_size=EVAL_CACHE_SIZE,
+                                   ranking='heuristic', workers=1, operators='list', seed=None, shared_selection=False,
+                                   verbose=True):
+    """
+    Runs the genetic algorithm for several customer requirements in a single pass. The metrics do not depend on the
+    targets, so each generation the parents and children of every target are evaluated once as one pool. Each target
+    then selects its own survivors, by the fitness of its own parents and children or, with shared_selection, of the
+    whole pool against every target at once
+    :param generations: The number of generations to run for
+    :param pop_size: The size of the population of each target, a minimum of 15
+    :param mut_rate: The chance of mutating each child satellite
+    :param targets: Matrix of customer requirements, one row per target
+    :param cache_size: The number of evaluated genomes kept between generations, 0 disables the cache
+    :param ranking: The ranking strategy, see calculate_rankings
+    :param workers: The number of processes evaluating the pool
+    :param operators: The genetic operators, see genetic_algorithm
+    :param seed: The seed of the random numbers, each target has its own stream spawned from it. Without
+    shared_selection a target evolves as genetic_algorithm would given its stream as the seed. None seeds from the
+    operating system
+    :param shared_selection: Whether each target selects from the whole pool, so a design found while evolving towards
+    one target is open to the others, rather than from its own parents and children. Ranking the whole pool for every
+    target is the slower option
+    :param verbose: Whether to print the progress of each generation
+    :return: list of the final population, the performance of each generation and the metric averages of each
+    generation for each target, as returned by genetic_algorithm
+    """
+    goals = fitness_goals(np.array(targets, dtype=np.float64, ndmin=2))
+    if pop_size < 15:
+        pop_size = 15
 
-    # Return the population and generations details.
-    performance_data = performance_data[~np.isnan(performance_data).any(1)]
-    return population, performance_data, metric_performance_data
+    cache = EvaluationCache(cache_size) if cache_size else None
+    evaluator = ParallelEvaluator(catalogue, workers) if workers > 1 else None
+    rngs = [np.random.default_rng(stream) for stream in np.random.SeedSequence(seed).spawn(len(goals))]
+    try:
+        populations = [create_population(pop_size, rng) for rng in rngs]
+        histories = [GenerationHistory(generations) for _ in goals]
+
+        for i in range(generations):
+            if verbose:
+                print("Starting generation: " + str(i))
+            pool = []
+            bounds = [0]
+            for population, rng in zip(populations, rngs):
+                pool += population_union(population, create_children(population, pop_size, mut_rate, operators, rng))
+                bounds.append(len(pool))
+
+            # Evaluate the pool once for every target
+            pool = calculate_population_metrics(pool, cache, evaluator)
+            if cache is not None:
+                hits, misses = cache.reset_counters()
+                if verbose:
+                    print('Evaluation cache hits: %d, misses: %d' % (hits, misses))
+            metrics = np.array([satellite['Metrics'] for satellite in pool])
+            if shared_selection:
+                # The distances of the whole pool from every target, targets by satellites by metrics
+                fitness = calculate_fitness_matrix(metrics[None, :, :], goals[:, None, :])
+
+            for t in range(len(goals)):
+                if shared_selection:
+                    start, end, target_fitness = 0, len(pool), fitness[t]
+                else:
+                    start, end = bounds[t], bounds[t + 1]
+                    target_fitness = calculate_fitness_matrix(metrics[start:end], goals[t])
+                # Each target ranks copies, with its own fitness. A satellite in the pool twice, the spare parent of an
+                # odd population carried into the children, keeps a single copy as it is one satellite in
+                # evolve_generation
+                copies = {}
+                candidates = []
+                for j in range(start, end):
+                    candidate = copies.setdefault(id(pool[j]), dict(pool[j]))
+                    candidate['Fitness'] = target_fitness[j - start]
+                    candidate['ID'] = j - start
+                    candidates.append(candidate)
+                ranked, max_zeros = calculate_rankings(candidates, ranking)
+                populations[t] = [satellite for satellite in ranked if satellite['Rank'] < pop_size]
+                average_dist, min_dist, metric_perfs = performance(populations[t])
+                histories[t].record(max_zeros, average_dist, min_dist, metric_perfs)
+    finally:
+        if evaluator is not None:
+            evaluator.shutdown()
+
+    return [([catalogue.name_satellite(satellite) for satellite in population], history.perf, history.met_perf)
+            for population, history in zip(populations, histories)]
 
 
 def performance(population):
-    values = np.array([np.nan, np.nan])
-    non_sum = np.array([np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan])
-
-    for j in range(len(population)):
-        num_zeros = np.sum(population[j]['Fitness'] == 0)
-        total_dist = np.sum(population[j]['Fitness'])
-        values = np.vstack((values, np.array([num_zeros, total_dist])))
-        non_sum = np.vstack((non_sum, population[j]['Fitness']))
+    """
+    This function calculates the performance of a population
+    :param population: A population of satellites with the fitness calculated
+    :return: The average total distance, the minimum total distance and the average of each fitness metric
+    """
+    non_sum = np.array([satellite['Fitness'] for satellite in population], ndmin=2)
+    values = np.column_stack((np.sum(non_sum == 0, axis=1), np.sum(non_sum, axis=1)))
 
     non_sum = non_sum[~np.isnan(non_sum).any(1)]
     values = values[~np.isnan(values).any(1)]
@@ -659,24 +935,25 @@ def performance(population):
     return average_dist, min_dist, metric_perfs
 
 
-def calculate_rankings(population):
+def calculate_rankings(population, strategy='heuristic'):
     """
-
-    :param population:
-    :return:
+    This function ranks every satellite in the population, giving each a unique 'Rank' from 0 for the best
+    :param population: A population of satellites with the fitness calculated
+    :param strategy: 'heuristic' ranks on the number of zero distances and then the total distance, ensuring the minimum
+    of each metric is near the top. 'nsga2' ranks by non-dominated front and then crowding distance
+    :return: The ranked population and the maximum number of zero distances
     """
+    if strategy == 'nsga2':
+        return calculate_nsga2_rankings(population)
+    elif strategy != 'heuristic':
+        raise ValueError('Unknown ranking strategy: ' + str(strategy))
+
     # for satellite in population:
     #     print(satellite)
-    values = np.array([np.nan, np.nan])
-    non_sum = np.array([np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan])
     # Finding the number of zero values
     cur_rank = 0
-    for j in range(len(population)):
-        num_zeros = np.sum(population[j]['Fitness'] < 10e-14)
-        total_dist = np.sum(population[j]['Fitness'])
-        values = np.vstack((values, np.array([num_zeros, total_dist])))
-        non_sum = np.vstack((non_sum, population[j]['Fitness']))
-
+    non_sum = np.array([satellite['Fitness'] for satellite in population], ndmin=2)
+    values = np.column_stack((np.sum(non_sum < 10e-14, axis=1), np.sum(non_sum, axis=1))).astype(np.float64)
 
     values = values[~np.isnan(values).any(1)]
     non_sum = non_sum[~np.isnan(non_sum).any(1)]
@@ -713,6 +990,22 @@ def calculate_rankings(population):
     return population, max_zeros
 
 
+def calculate_nsga2_rankings(population):
+    """
+    This function ranks the population as in NSGA-II, by a fast non-dominated sort over all the fitness objectives with
+    the crowding distance breaking ties within each front
+    :param population: A population of satellites with the fitness calculated
+    :return: The ranked population and the maximum number of zero distances
+    """
+    fitness = np.array([satellite['Fitness'] for satellite in population])
+    order, fronts = nsga2_order(fitness)
+    for rank in range(len(order)):
+        population[order[rank]]['Rank'] = rank
+
+    max_zeros = np.max(np.sum(fitness < 10e-14, axis=1))
+    return population, max_zeros
+
+
 def calculate_fitness(population, targets):
     """
     This function goes through an entire population and calculates the individuals fitness compared to the target goals
@@ -721,38 +1014,45 @@ def calculate_fitness(population, targets):
     :param targets:
     :return:
     """
-    # The goal values are constants for satellites to operate effectively and within requirements, the customer reqs
-    # are the same and are covered by the targets
-    volume_goal = 1
-    mass_goal = 1
-    cpu_goal = 1
-    power_goal = 1
-    br_down_goal = targets[0]
-    br_up_goal = targets[1]
-    att_mom_goal = targets[2]
-    att_know_goal = targets[2]
-    wave_goal = targets[3]
-    wave_det_goal = targets[4]
-
-    for satellite in population:
-        vol_fit = good_enough_distance(volume_goal, satellite['Metrics'][0])
-        mass_fit = good_enough_distance(mass_goal, satellite['Metrics'][1])
-        cpu_fit = good_enough_distance(cpu_goal, satellite['Metrics'][2])
-        power_fit = good_enough_distance(power_goal, satellite['Metrics'][3])
-        br_d_fit = good_enough_distance(br_down_goal, satellite['Metrics'][4])
-        br_u_fit = good_enough_distance(br_up_goal, satellite['Metrics'][5])
-        att_m_fit = good_enough_distance(att_mom_goal, satellite['Metrics'][6])
-        att_k_fit = good_enough_distance(att_know_goal, satellite['Metrics'][7])
-        wave_fit = nearest_distance(wave_goal, satellite['Metrics'][8], 0.005)
-        wave_d_fit = good_enough_distance(wave_det_goal, satellite['Metrics'][9])
-        satellite['Fitness'] = np.array([vol_fit, mass_fit, cpu_fit, power_fit, br_d_fit, br_u_fit, att_m_fit,
-                                         att_k_fit, wave_fit, wave_d_fit])
+    metrics = np.array([satellite['Metrics'] for satellite in population])
+    fitness = calculate_fitness_matrix(metrics, fitness_goals(targets))
+    for j in range(len(population)):
+        population[j]['Fitness'] = fitness[j]
 
     # satellite['Metrics'] = np.array([volume_met, mass_met, cpu_met, power_met, br_down_met, br_up_met, att_met,
     #                                  att_know_met, wavelength_met, wave_det_met])
     return population
 
 
+def fitness_goals(targets):
+    """
+    This function creates the goal for each metric. The goal values are constants for satellites to operate effectively
+    and within requirements, the customer reqs are the same and are covered by the targets
+    :param targets: The customer requirements, the last axis is the 5 targets so several can be given at once
+    :return: The goals, the last axis is the 10 metrics
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    constant_goals = np.ones(targets.shape[:-1] + (4,))
+    # Volume, mass, cpu and power, then bit rate down, bit rate up, attitude moment and knowledge (both from the same
+    # target), wavelength and wavelength detail
+    return np.concatenate((constant_goals, targets[..., [0, 1, 2, 2, 3, 4]]), axis=-1)
+
+
+def calculate_fitness_matrix(metrics, goals, leeway=WAVELENGTH_LEEWAY):
+    """
+    The array version of calculating the fitness, every argument broadcasts against the others
+    :param metrics: Matrix of metrics, one row per satellite
+    :param goals: The goals from fitness_goals
+    :param leeway: The leeway for the objectives measured by nearest_distance
+    :return: Fitness matrix, the broadcast shape of the metrics and goals
+    """
+    metrics, goals = np.broadcast_arrays(metrics, goals)
+    with np.errstate(invalid='ignore'):
+        good_enough = np.where(metrics > goals, 0, np.clip(goals - metrics, 0, 1))
+        nearest = np.where(np.abs(metrics) < 10e-12, 1, np.clip(np.abs(goals - metrics) - leeway, 0, 1))
+    return np.where(NEAREST_OBJECTIVES, nearest, good_enough)
+
+
 def nearest_distance(goal, metric, leeway):
     """
     This function calculates the distance for metrics that aim to be the closest to the desired requirement
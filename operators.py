@@ -0,0 +1,198 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module contains the array versions of the genetic operators. The child population is created and mutated over the
+genome matrices of a population.Population in one pass, with the random values drawn in bulk, rather than a satellite
+at a time. The operators keep the behaviour of nsga.create_child_population and nsga.mutate_satellite.
+"""
+
+import numpy as np
+
+from population import Population, EMPTY_SLOT
+
+
+def batch_child_population(population, catalogue, rng=None):
+    """
+    Creates the child population, as nsga.create_child_population. The population is split in half and each pair of
+    parents pools their components, the first child takes its structure from the first half and is filled from the
+    pool in a random order, the second child takes its structure from the second half and is filled from what remains.
+    The panels of the pair are swapped half of the time, and the middle satellite of an odd population is kept as is
+    :param population: The parent Population
+    :param catalogue: The compiled catalogue
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: The child Population, the children of each pair are adjacent
+    """
+    rng = np.random.default_rng(rng)
+    size = len(population)
+    half = size // 2
+    first = np.arange(half)
+    second = np.arange(size - half, size)
+
+    children = Population(size, population.components.shape[1], population.details.dtype)
+    sat_a = 2 * first
+    sat_b = sat_a + 1
+    children.structure[sat_a] = population.structure[first]
+    children.structure[sat_b] = population.structure[second]
+    children.details[:2 * half] = population.details[np.column_stack((first, second)).reshape(-1)][:, [0, 0, 2, 2]]
+
+    swap = rng.random(half) >= 0.5
+    children.panels[sat_a] = np.where(swap[:, None], population.panels[second], population.panels[first])
+    children.panels[sat_b] = np.where(swap[:, None], population.panels[first], population.panels[second])
+
+    # Each pool is shuffled by sorting on random keys, with the empty slots sorted to the end
+    pool = np.concatenate((population.components[first], population.components[second]), axis=1)
+    keys = np.where(pool == EMPTY_SLOT, np.inf, rng.random(pool.shape))
+    pool = np.take_along_axis(pool, np.argsort(keys, axis=1, kind='stable'), axis=1)
+
+    used = fill_population(children, sat_a, pool, catalogue, rng)
+    fill_population(children, sat_b, np.where(used, EMPTY_SLOT, pool), catalogue, rng)
+
+    if size % 2:
+        spare = population.take([half])
+        children.structure[-1] = spare.structure[0]
+        children.panels[-1] = spare.panels[0]
+        width = spare.components.shape[1]
+        if width > children.components.shape[1]:
+            widen(children, width)
+        children.components[-1, :width] = spare.components[0]
+        children.num_components[-1] = spare.num_components[0]
+        children.details[-1] = spare.details[0]
+        children.metrics[-1] = spare.metrics[0]
+        children.fitness[-1] = spare.fitness[0]
+        children.rank[-1] = spare.rank[0]
+    return children
+
+
+def mutate_population(population, mut_rate, catalogue, mutable=None, rng=None):
+    """
+    Mutates the population in place, as nsga.mutate_satellite applied to each satellite with a chance of mut_rate. A
+    mutated satellite either takes a new random structure, with a chance of mut_rate, or gains a new random component.
+    It is then refilled from its components, newest first, dropping those that no longer fit and filling any spare
+    slots with random components
+    :param population: The Population to mutate
+    :param mut_rate: The chance of mutating each satellite, and of mutating the structure of a mutated satellite
+    :param catalogue: The compiled catalogue
+    :param mutable: The number of satellites, from the start of the population, that may be mutated
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: The indices of the mutated satellites
+    """
+    rng = np.random.default_rng(rng)
+    mutable = len(population) if mutable is None else max(mutable, 0)
+    rows = np.where(rng.random(mutable) < mut_rate)[0]
+    if not len(rows):
+        return rows
+
+    structure_mut = rng.random(len(rows)) < mut_rate
+    new_parts = np.floor(rng.random(len(rows)) *
+                         np.where(structure_mut, catalogue.num_structures, catalogue.num_components)).astype(np.int64)
+
+    new_structure = rows[structure_mut]
+    population.structure[new_structure] = new_parts[structure_mut]
+    population.details[new_structure] = np.column_stack((catalogue.structure_internal[new_parts[structure_mut]],) * 2 +
+                                                        (catalogue.structure_external[new_parts[structure_mut]],) * 2)
+
+    # The pool is the components in reverse order, led by the new component if there is one
+    counts = population.num_components[rows]
+    pool = np.full((len(rows), population.components.shape[1] + 1), EMPTY_SLOT, dtype=population.components.dtype)
+    pool[:, :-1] = population.components[rows]
+    pool[np.where(~structure_mut)[0], counts[~structure_mut]] = new_parts[~structure_mut]
+    pool_counts = counts + ~structure_mut
+    inside = np.arange(pool.shape[1])[None, :] < pool_counts[:, None]
+    source = np.where(inside, pool_counts[:, None] - 1 - np.arange(pool.shape[1])[None, :], 0)
+    pool = np.where(inside, np.take_along_axis(pool, source, axis=1), EMPTY_SLOT)
+
+    population.components[rows] = EMPTY_SLOT
+    population.num_components[rows] = 0
+    population.details[rows, 1] = population.details[rows, 0]
+    population.details[rows, 3] = population.details[rows, 2]
+    population.metrics[rows] = np.nan
+    fill_population(population, rows, pool, catalogue, rng)
+    return rows
+
+
+def fill_population(population, rows, pool, catalogue, rng=None):
+    """
+    Fills the available slots of the satellites at rows, as nsga.fill_satellite. Each satellite is filled from its row
+    of the pool in column order, dropping those that do not fit, and then with random components that fit. The
+    satellites are filled side by side, a column or random component at a time
+    :param population: The Population holding the satellites, their components must be empty
+    :param rows: The indices of the satellites to fill
+    :param pool: Matrix of components to use first, a row per satellite padded with EMPTY_SLOT
+    :param catalogue: The compiled catalogue
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: Boolean matrix of the pool components used or dropped
+    """
+    rng = np.random.default_rng(rng)
+    consumed = np.zeros(pool.shape, dtype=bool)
+    for column in range(pool.shape[1]):
+        component = pool[:, column]
+        active = (population.details[rows, 1] > 0) & (component != EMPTY_SLOT)
+        consumed[:, column] = active
+        fits = active & fits_slots(population, rows, np.where(active, component, 0), catalogue)
+        add_components(population, rows[fits], component[fits], catalogue)
+
+    costs = catalogue.slot_costs
+    takes_slot = costs[:, 0] < 0
+    group_sizes = np.diff(catalogue.slot_cost_offsets)
+    active = rows[population.details[rows, 1] > 0]
+    while len(active):
+        fits = (population.details[active, 1][:, None] + costs[None, :, 0] > 0) & \
+               (population.details[active, 3][:, None] + costs[None, :, 1] > 0)
+        # A satellite is full once no fitting component would take up an internal slot
+        open_slots = (fits & takes_slot).any(axis=1)
+        active = active[open_slots]
+        fits = fits[open_slots]
+        if not len(active):
+            break
+
+        counts = np.where(fits, group_sizes, 0)
+        totals = np.cumsum(counts, axis=1)
+        draw = np.minimum(np.floor(rng.random(len(active)) * totals[:, -1]), totals[:, -1] - 1).astype(np.int64)
+        group = np.argmax(totals > draw[:, None], axis=1)
+        index = catalogue.slot_cost_offsets[group] + draw - (totals - counts)[np.arange(len(active)), group]
+        add_components(population, active, catalogue.slot_cost_components[index], catalogue)
+        active = active[population.details[active, 1] > 0]
+    return consumed
+
+
+def fits_slots(population, rows, components, catalogue):
+    """
+    Checks whether each component fits its satellite, adding it must leave some internal and external slots available
+    :param population: The Population holding the satellites
+    :param rows: The indices of the satellites
+    :param components: The component of each satellite
+    :param catalogue: The compiled catalogue
+    :return: Boolean vector
+    """
+    return (population.details[rows, 1] + catalogue.component_internal[components] > 0) & \
+        (population.details[rows, 3] + catalogue.component_external[components] > 0)
+
+
+def add_components(population, rows, components, catalogue):
+    """
+    Appends a component to each satellite and takes up its slots, the component matrix is widened when full
+    :param population: The Population holding the satellites
+    :param rows: The indices of the satellites, each at most once
+    :param components: The component to add to each satellite
+    :param catalogue: The compiled catalogue
+    """
+    if not len(rows):
+        return
+    counts = population.num_components[rows]
+    if counts.max() >= population.components.shape[1]:
+        widen(population, 2 * population.components.shape[1])
+    population.components[rows, counts] = components
+    population.num_components[rows] = counts + 1
+    population.details[rows, 1] = population.details[rows, 1] + catalogue.component_internal[components]
+    population.details[rows, 3] = population.details[rows, 3] + catalogue.component_external[components]
+
+
+def widen(population, width):
+    """
+    Widens the component matrix of a population, the new positions are empty
+    :param population: The Population to widen
+    :param width: The new width
+    """
+    components = np.full((len(population), width), EMPTY_SLOT, dtype=population.components.dtype)
+    components[:, :population.components.shape[1]] = population.components
+    population.components = components
@@ -0,0 +1,171 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module holds the array backed form of a population of satellites. Rather than a list of satellite dicts, each
+field is stored as a single numpy array covering the whole population, with one row per satellite. This keeps the memory
+used per satellite small and allows whole population operations to be vectorised.
+"""
+
+import numpy as np
+
+NUM_METRICS = 10
+# Padding value for the unused positions in the component matrix
+EMPTY_SLOT = -1
+
+
+class Population:
+    """
+    A population of satellites stored as a structure of arrays. The IDs refer to the compiled catalogue, the components
+    matrix is padded with EMPTY_SLOT past the number of components in each satellite
+    """
+    def __init__(self, size, width, details_dtype=np.float64):
+        """
+        Allocates an empty population, all satellites are unevaluated and unranked
+        :param size: The number of satellites
+        :param width: The maximum number of components held by any satellite
+        :param details_dtype: The type of the slot details, matches the slot columns of the catalogue
+        """
+        self.structure = np.zeros(size, dtype=np.int32)
+        self.panels = np.zeros((size, 2), dtype=np.int32)
+        self.components = np.full((size, width), EMPTY_SLOT, dtype=np.int32)
+        self.num_components = np.zeros(size, dtype=np.int32)
+        # Details are the internal slots, available internal slots, external slots and available external slots
+        self.details = np.zeros((size, 4), dtype=details_dtype)
+        self.metrics = np.full((size, NUM_METRICS), np.nan)
+        self.fitness = np.full((size, NUM_METRICS), np.nan)
+        self.rank = np.full(size, -1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.structure)
+
+    @classmethod
+    def from_dicts(cls, population):
+        """
+        Converts a list of ID based satellite dicts, as created by nsga.create_population, into a Population
+        :param population: list of satellite dicts
+        :return: The equivalent Population
+        """
+        size = len(population)
+        width = max([len(satellite['Components']) for satellite in population] + [1])
+        details = np.array([satellite['Details'] for satellite in population], ndmin=2)
+        pop = cls(size, width, details.dtype if size else np.float64)
+        if not size:
+            return pop
+
+        pop.details[:] = details
+        for i, satellite in enumerate(population):
+            comps = satellite['Components']
+            pop.structure[i] = satellite['Structure']
+            pop.panels[i] = satellite['Panels'][0]
+            pop.components[i, :len(comps)] = comps
+            pop.num_components[i] = len(comps)
+            if len(satellite['Metrics']):
+                pop.metrics[i] = satellite['Metrics']
+            if len(satellite['Fitness']):
+                pop.fitness[i] = satellite['Fitness']
+            if 'Rank' in satellite:
+                pop.rank[i] = satellite['Rank']
+        return pop
+
+    def to_dicts(self, catalogue=None):
+        """
+        Converts the Population back into a list of satellite dicts
+        :param catalogue: If given, the satellites use the names from the catalogue rather than the IDs
+        :return: list of satellite dicts
+        """
+        population = []
+        for i in range(len(self)):
+            satellite = {'Structure': int(self.structure[i]),
+                         'Components': self.components[i, :self.num_components[i]].tolist(),
+                         'Panels': [self.panels[i].tolist()],
+                         'Metrics': np.array([], ndmin=1),
+                         'Fitness': np.array([], ndmin=1),
+                         'Details': self.details[i].copy()}
+            if not np.isnan(self.metrics[i]).any():
+                satellite['Metrics'] = self.metrics[i].copy()
+            if not np.isnan(self.fitness[i]).any():
+                satellite['Fitness'] = self.fitness[i].copy()
+            if self.rank[i] >= 0:
+                satellite['Rank'] = int(self.rank[i])
+            if catalogue is not None:
+                satellite = catalogue.name_satellite(satellite)
+            population.append(satellite)
+        return population
+
+    def take(self, indices):
+        """
+        Creates a new Population of the satellites at the given indices, in the order given
+        :param indices: Integer indices or a boolean mask
+        :return: A new Population
+        """
+        indices = np.arange(len(self))[indices]
+        width = max(int(self.num_components[indices].max()) if len(indices) else 1, 1)
+        pop = Population(len(indices), width, self.details.dtype)
+        pop.structure[:] = self.structure[indices]
+        pop.panels[:] = self.panels[indices]
+        pop.components[:] = self.components[indices, :width]
+        pop.num_components[:] = self.num_components[indices]
+        pop.details[:] = self.details[indices]
+        pop.metrics[:] = self.metrics[indices]
+        pop.fitness[:] = self.fitness[indices]
+        pop.rank[:] = self.rank[indices]
+        return pop
+
+    def nbytes(self):
+        """
+        The memory held by the population arrays
+        :return: Total size in bytes
+        """
+        return sum(array.nbytes for array in (self.structure, self.panels, self.components, self.num_components,
+                                              self.details, self.metrics, self.fitness, self.rank))
+
+
+def population_union(population_one, population_two):
+    """
+    Concatenates two Populations, the array equivalent of nsga.population_union
+    :param population_one: A Population of any size
+    :param population_two: A different Population of any size
+    :return: P_1 U P_2
+    """
+    width = max(population_one.components.shape[1], population_two.components.shape[1])
+    pop = Population(len(population_one) + len(population_two), width,
+                     np.result_type(population_one.details, population_two.details))
+    split = len(population_one)
+    for start, part in ((0, population_one), (split, population_two)):
+        end = start + len(part)
+        pop.structure[start:end] = part.structure
+        pop.panels[start:end] = part.panels
+        pop.components[start:end, :part.components.shape[1]] = part.components
+        pop.num_components[start:end] = part.num_components
+        pop.details[start:end] = part.details
+        pop.metrics[start:end] = part.metrics
+        pop.fitness[start:end] = part.fitness
+        pop.rank[start:end] = part.rank
+    return pop
+
+
+def canonical_genomes(population):
+    """
+    Creates the canonical genome of every satellite, as evaluation.genome_key. The order the components were added in
+    does not change the metrics, so each row holds the structure, the panel pair and then the sorted components
+    :param population: A Population
+    :return: Matrix of the canonical genomes, one row per satellite padded with EMPTY_SLOT
+    """
+    # The empty slots sort to the end, past every component ID
+    components = np.where(population.components == EMPTY_SLOT, np.iinfo(population.components.dtype).max,
+                          population.components)
+    components = np.sort(components, axis=1)
+    components[components == np.iinfo(population.components.dtype).max] = EMPTY_SLOT
+    return np.column_stack((population.structure, population.panels, components))
+
+
+def duplicate_genomes(population):
+    """
+    Finds the satellites whose canonical genome matches that of an earlier satellite in the population
+    :param population: A Population
+    :return: Boolean vector, True for every satellite but the first of each genome
+    """
+    duplicates = np.ones(len(population), dtype=bool)
+    if len(population):
+        duplicates[np.unique(canonical_genomes(population), axis=0, return_index=True)[1]] = False
+    return duplicates
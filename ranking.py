@@ -0,0 +1,112 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module contains the array functions for ranking a population by Pareto dominance, as in NSGA-II. The fitness values
+are distances from the goals, so every objective is minimised.
+"""
+
+import numpy as np
+
+# Bound on the number of pairs held in memory at once by the dominance checks, and the most rows checked at a time
+DOMINANCE_CHUNK = 2 ** 24
+MAX_BLOCK = 64
+
+
+def non_dominated_sort(fitness, chunk=DOMINANCE_CHUNK):
+    """
+    Sorts the satellites into non-dominated fronts. Identical fitness vectors are sorted once and share a front. The
+    unique vectors are in lexicographic order, so any dominating vector comes before those it dominates and each front
+    is one more than the highest front of its dominators. Each objective is replaced by its rank so the comparisons are
+    made on small integers
+    :param fitness: Matrix of fitness values, one row per satellite
+    :param chunk: The maximum number of pairs compared at a time
+    :return: Vector of the front of each satellite, 0 is the non-dominated front
+    """
+    unique, inverse = np.unique(fitness, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    size, num_objectives = unique.shape
+    index_type = np.min_scalar_type(size)
+    ranks = np.empty((num_objectives, size), dtype=index_type)
+    for m in range(num_objectives):
+        ranks[m] = np.unique(unique[:, m], return_inverse=True)[1].reshape(-1)
+
+    fronts = np.zeros(size, dtype=index_type)
+    block = int(min(max(1, chunk // max(size, 1)), MAX_BLOCK))
+    dominated = np.empty((block, size), dtype=bool)
+    compared = np.empty((block, size), dtype=bool)
+    dominator_fronts = np.empty((block, size), dtype=index_type)
+
+    for start in range(0, size, block):
+        end = min(start + block, size)
+        # dom[j, i] is True where unique vector i dominates vector start + j, only earlier vectors can dominate
+        dom = dominated[:end - start, :end]
+        np.less_equal(ranks[0, None, :end], ranks[0, start:end, None], out=dom)
+        for m in range(1, num_objectives):
+            np.less_equal(ranks[m, None, :end], ranks[m, start:end, None], out=compared[:end - start, :end])
+            dom &= compared[:end - start, :end]
+        dom[np.arange(end - start), np.arange(start, end)] = False
+
+        np.multiply(dom, fronts[None, :end] + 1, out=dominator_fronts[:end - start, :end])
+        block_fronts = dominator_fronts[:end - start, :end].max(axis=1)
+
+        # Dominance within the block is resolved by relaxation, each pass settles at least one more front
+        within = dom[:, start:end]
+        if within.any():
+            while True:
+                relaxed = np.maximum(block_fronts, np.max(within * (block_fronts[None, :] + 1), axis=1))
+                if (relaxed == block_fronts).all():
+                    break
+                block_fronts = relaxed
+        fronts[start:end] = block_fronts
+
+    return fronts[inverse].astype(np.int64)
+
+
+def crowding_distance(fitness, fronts):
+    """
+    Calculates the crowding distance of every satellite within its own front. The satellites at either end of a front,
+    for any objective, have an infinite distance
+    :param fitness: Matrix of fitness values, one row per satellite
+    :param fronts: Vector of the front of each satellite, from non_dominated_sort
+    :return: Vector of crowding distances
+    """
+    size, num_objectives = fitness.shape
+    distance = np.zeros(size)
+    if not size:
+        return distance
+
+    for m in range(num_objectives):
+        order = np.lexsort((fitness[:, m], fronts))
+        values = fitness[order, m]
+        front = fronts[order]
+        first = np.ones(size, dtype=bool)
+        first[1:] = front[1:] != front[:-1]
+        last = np.ones(size, dtype=bool)
+        last[:-1] = front[:-1] != front[1:]
+
+        # The range of the objective within each front normalises the gaps
+        starts = np.where(first)[0]
+        ends = np.where(last)[0]
+        spread = np.repeat(values[ends] - values[starts], ends - starts + 1)
+
+        gap = np.zeros(size)
+        interior = ~(first | last)
+        gap[interior] = values[2:][interior[1:-1]] - values[:-2][interior[1:-1]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gap = np.where(spread > 0, gap / spread, 0)
+        gap[first | last] = np.inf
+        distance[order] += gap
+
+    return distance
+
+
+def nsga2_order(fitness, chunk=DOMINANCE_CHUNK):
+    """
+    Orders the satellites by front, breaking ties within a front by the larger crowding distance
+    :param fitness: Matrix of fitness values, one row per satellite
+    :param chunk: The maximum number of pairs compared at a time
+    :return: Indices of the satellites from best to worst, and the front of each satellite
+    """
+    fronts = non_dominated_sort(fitness, chunk)
+    distance = crowding_distance(fitness, fronts)
+    return np.lexsort((-distance, fronts)), fronts
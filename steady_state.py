@@ -0,0 +1,244 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module runs the genetic algorithm in a steady state rather than generation by generation. A pool of worker
+processes breeds and evaluates small batches of children continuously from parents chosen in the main process, each
+batch is inserted into the population as soon as it arrives and another is sent in its place, to keep every worker
+busy. A design that is slow to evaluate only holds up its own batch, rather than the whole generation.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import time
+
+import numpy as np
+
+import nsga
+from evaluation import evaluate_genomes
+from history import GenerationHistory
+from population import Population
+
+REPLACEMENTS = ('worst', 'crowding')
+# The number of children in each batch sent to a worker. Breeding and evaluating a child takes about 150us, so a batch
+# is several times the cost of sending it to a worker and back, about 1ms
+STEADY_BATCH_SIZE = 32
+# The number of batches queued for each worker, so a worker finishing a batch always has another waiting
+BATCHES_PER_WORKER = 2
+# Distances below this are counted as zero, as in nsga.calculate_rankings
+ZERO_DISTANCE = 10e-14
+
+
+def steady_state_genetic_algorithm(evaluations, pop_size, mut_rate, target_reqs, replacement='worst', workers=1,
+                                   batch_size=STEADY_BATCH_SIZE, seed=None, verbose=True):
+    """
+    Runs the steady state genetic algorithm. Parents are chosen by binary tournament, on the number of zero distances
+    and then the total distance as in the heuristic ranking, and their children replace members of the population
+    they are better than
+    :param evaluations: The number of children to evaluate
+    :param pop_size: The size of the population, a minimum of 15
+    :param mut_rate: The chance of mutating each child satellite
+    :param target_reqs: The customer requirements to evolve towards
+    :param replacement: 'worst' has each child replace the worst satellite in the population, 'crowding' has it replace
+    the satellite with the nearest fitness, in either case only if the child is better
+    :param workers: The number of worker processes breeding and evaluating the children, 1 runs in this process. More
+    workers only pay off once a batch takes well over the 1ms it takes to send it to a worker and back
+    :param batch_size: The number of children in each batch sent to a worker, at most pop_size
+    :param seed: The seed of the random numbers. Each batch has its own random stream, but the batches are inserted as
+    they finish, so only a run with a single worker is repeatable. None seeds from the operating system
+    :param verbose: Whether to print the progress of the run
+    :return: The final population, the performance and the metric averages recorded after every pop_size evaluations,
+    and the number of evaluations per second
+    """
+    if replacement not in REPLACEMENTS:
+        raise ValueError('Unknown replacement: ' + str(replacement))
+    if pop_size < 15:
+        pop_size = 15
+    batch_size = max(min(batch_size, pop_size), 1)
+
+    # The main process draws the tournaments, and spawns the random stream of each batch
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    goals = nsga.fitness_goals(target_reqs)
+    history = GenerationHistory(evaluations // pop_size)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initialise_breeder,
+                                   initargs=(nsga.catalogue,)) if workers > 1 else None
+    try:
+        # The initial population is evaluated in one batch per worker
+        population = nsga.create_population(pop_size, rng)
+        batch = Population.from_dicts(population)
+        futures = [submit(executor, evaluate_batch, batch.structure[shard], batch.panels[shard],
+                          batch.components[shard], batch.num_components[shard])
+                   for shard in np.array_split(np.arange(pop_size), workers)]
+        metrics = np.concatenate([future.result() for future in futures])
+        fitness = nsga.calculate_fitness_matrix(metrics, goals)
+        for satellite, satellite_metrics, satellite_fitness in zip(population, metrics, fitness):
+            satellite['Metrics'] = satellite_metrics
+            satellite['Fitness'] = satellite_fitness
+
+        # The scores of the heuristic ranking are kept per satellite, so the worst only needs finding again once it
+        # has been replaced
+        zeros = np.sum(fitness < ZERO_DISTANCE, axis=1)
+        totals = np.sum(fitness, axis=1)
+        worst = worst_index(zeros, totals)
+
+        start = time.time()
+        submitted = 0
+        evaluated = 0
+        replaced = 0
+        pending = []
+        while evaluated < evaluations:
+            while submitted < evaluations and len(pending) < workers * BATCHES_PER_WORKER:
+                size = min(batch_size, evaluations - submitted)
+                parents = [genome(population[j]) for j in tournament(zeros, totals, 2 * ((size + 1) // 2), rng)]
+                pending.append(submit(executor, breed_batch, parents, size, mut_rate, seeds.spawn(1)[0]))
+                submitted += size
+
+            done = wait(pending, return_when=FIRST_COMPLETED).done
+            # The batches are inserted as they finish, those finishing together in the order they were submitted
+            for future in [future for future in pending if future in done]:
+                pending.remove(future)
+                children, child_metrics = future.result()
+                child_fitness = nsga.calculate_fitness_matrix(child_metrics, goals)
+                child_zeros = np.sum(child_fitness < ZERO_DISTANCE, axis=1)
+                child_totals = np.sum(child_fitness, axis=1)
+                for j, child in enumerate(children):
+                    child['Metrics'] = child_metrics[j]
+                    child['Fitness'] = child_fitness[j]
+                    if replacement == 'worst':
+                        target = worst
+                    else:
+                        target = np.argmin(np.sum((fitness - child_fitness[j]) ** 2, axis=1))
+
+                    # A child can only be worse than the worst if it is worse than what it replaces, so the worst
+                    # only changes when it is the one replaced
+                    if better(child_zeros[j], child_totals[j], zeros[target], totals[target]):
+                        population[target] = child
+                        fitness[target] = child_fitness[j]
+                        zeros[target] = child_zeros[j]
+                        totals[target] = child_totals[j]
+                        if target == worst:
+                            worst = worst_index(zeros, totals)
+                        replaced += 1
+
+                    evaluated += 1
+                    if not evaluated % pop_size:
+                        average_dist, min_dist, metric_perfs = nsga.performance(population)
+                        history.record(np.max(zeros), average_dist, min_dist, metric_perfs)
+                        if verbose:
+                            print('Evaluated %d children, replaced %d, minimum distance %.4f' %
+                                  (evaluated, replaced, min_dist))
+        throughput = evaluated / max(time.time() - start, 1e-9)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if verbose:
+        print('%.1f evaluations per second' % throughput)
+
+    # Rank the population as the heuristic ranking orders it, and convert the IDs back to names
+    for rank, j in enumerate(worst_first(fitness)[::-1]):
+        population[j]['Rank'] = rank
+    population = [nsga.catalogue.name_satellite(satellite) for satellite in population]
+    return population, history.perf, history.met_perf, throughput
+
+
+def initialise_breeder(catalogue):
+    """
+    Stores the catalogue in a worker process, where the genetic operators and evaluation use it from nsga, run once
+    as each worker starts
+    :param catalogue: The compiled catalogue
+    """
+    nsga.catalogue = catalogue
+
+
+def submit(executor, function, *args):
+    """
+    Runs a function on the workers
+    :param executor: The ProcessPoolExecutor of the workers, or None to run it in this process
+    :param function: The function, with the arguments following
+    :return: A Future of the result
+    """
+    if executor is not None:
+        return executor.submit(function, *args)
+    future = Future()
+    future.set_result(function(*args))
+    return future
+
+
+def genome(satellite):
+    """
+    The parts of a satellite the genetic operators need, sent to the workers in place of the whole satellite
+    :param satellite: ID based satellite
+    :return: The satellite without its metrics and fitness
+    """
+    return {'Structure': satellite['Structure'], 'Components': satellite['Components'], 'Panels': satellite['Panels'],
+            'Details': satellite['Details']}
+
+
+def breed_batch(parents, size, mut_rate, seed):
+    """
+    Creates a batch of mutated children from pairs of parents, see nsga.create_child_population, and evaluates them
+    :param parents: list of the parent genomes, an even number
+    :param size: The number of children
+    :param mut_rate: The chance of mutating each child satellite
+    :param seed: The numpy SeedSequence of the random stream of this batch
+    :return: list of the children and their metrics matrix
+    """
+    rng = np.random.default_rng(seed)
+    children = nsga.create_child_population(parents, rng)
+    for j in np.where(rng.random(len(children)) < mut_rate)[0]:
+        children[j] = nsga.mutate_satellite(children[j], mut_rate, rng)
+    children = children[:size]
+
+    batch = Population.from_dicts(children)
+    return children, evaluate_batch(batch.structure, batch.panels, batch.components, batch.num_components)
+
+
+def evaluate_batch(structure, panels, components, num_components):
+    """
+    Evaluates packed genomes with the catalogue of nsga, see evaluation.evaluate_genomes
+    :return: The metrics matrix
+    """
+    return evaluate_genomes(structure, panels, components, num_components, nsga.catalogue)
+
+
+def tournament(zeros, totals, size, rng):
+    """
+    Chooses parents by binary tournament, the better of two random satellites
+    :param zeros: The number of zero distances of each satellite
+    :param totals: The total distance of each satellite
+    :param size: The number of parents
+    :param rng: numpy random Generator
+    :return: The indices of the parents
+    """
+    entrants = rng.integers(0, len(zeros), size=(size, 2))
+    first, second = entrants[:, 0], entrants[:, 1]
+    return np.where(better(zeros[first], totals[first], zeros[second], totals[second]), first, second)
+
+
+def better(zeros, totals, other_zeros, other_totals):
+    """
+    Whether satellites are better than others in the heuristic ranking, with more zero distances or as many and a
+    smaller total distance
+    :return: Boolean, or a vector for vectors of scores
+    """
+    return (zeros > other_zeros) | ((zeros == other_zeros) & (totals < other_totals))
+
+
+def worst_index(zeros, totals):
+    """
+    Finds the worst satellite, with the fewest zero distances and then the largest total distance
+    :param zeros: The number of zero distances of each satellite
+    :param totals: The total distance of each satellite
+    :return: The index of the worst satellite, the first of any tied
+    """
+    fewest = np.flatnonzero(zeros == zeros.min())
+    return fewest[np.argmax(totals[fewest])]
+
+
+def worst_first(fitness):
+    """
+    Orders satellites from the worst to the best, by the fewest zero distances and then the largest total distance
+    :param fitness: Matrix of fitness values, one row per satellite
+    :return: The indices of the satellites, worst first
+    """
+    return np.lexsort((-np.sum(fitness, axis=1), np.sum(fitness < ZERO_DISTANCE, axis=1)))
@@ -0,0 +1,107 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module holds the stopping criteria of the genetic algorithm. Rather than always running for the full number of
+generations, a run can stop once every objective is met, once the minimum distance has stopped improving, or once a
+wall clock or evaluation budget is spent.
+"""
+
+from collections import deque
+import time
+
+import numpy as np
+
+from population import NUM_METRICS
+
+
+class StoppingCriteria:
+    """
+    The conditions under which the genetic algorithm stops early, any condition left as None is not checked
+    """
+    def __init__(self, target_zeros=NUM_METRICS, stagnation=None, tolerance=0.0, time_limit=None,
+                 max_evaluations=None):
+        """
+        Sets the stopping conditions
+        :param target_zeros: Stop once a satellite has this many zero distances, by default every objective met
+        :param stagnation: Stop once the minimum distance has not improved over this many generations
+        :param tolerance: The improvement in the minimum distance that is not counted as improving
+        :param time_limit: Stop once this many seconds have passed since the run started
+        :param max_evaluations: Stop once this many satellites have been evaluated
+        """
+        self.target_zeros = target_zeros
+        self.stagnation = stagnation
+        self.tolerance = tolerance
+        self.time_limit = time_limit
+        self.max_evaluations = max_evaluations
+        self.start_time = None
+        self.evaluations = 0
+        self.reset_progress()
+
+    def start(self):
+        """
+        Starts the clock and evaluation count of a run
+        """
+        self.start_time = time.time()
+        self.evaluations = 0
+        self.reset_progress()
+
+    def reset_progress(self):
+        """
+        Clears the progress followed through the history, so the history of a run is read again from its start
+        """
+        # The number of history rows read, the generations counted, their latest maximum zeros, the smallest minimum
+        # distance before the stagnation window, the minimum distances within it and the increasing minima of the
+        # window with their generations, the first of which is the smallest in the window
+        self.rows_read = 0
+        self.generations = 0
+        self.max_zeros = None
+        self.best_before = np.inf
+        self.window = deque()
+        self.window_minima = deque()
+
+    def follow(self, max_zeros, min_dist):
+        """
+        Takes in the performance of the next generation, updating the best minimum distances before and within the
+        stagnation window in constant time, rather than searching the whole history every generation
+        :param max_zeros: The maximum number of zero distances of the generation
+        :param min_dist: The minimum distance of the generation
+        """
+        self.max_zeros = max_zeros
+        if self.stagnation is not None:
+            self.window.append(min_dist)
+            if len(self.window) > self.stagnation:
+                self.best_before = min(self.best_before, self.window.popleft())
+            while self.window_minima and self.window_minima[-1][1] >= min_dist:
+                self.window_minima.pop()
+            self.window_minima.append((self.generations, min_dist))
+            if self.window_minima[0][0] <= self.generations - self.stagnation:
+                self.window_minima.popleft()
+        self.generations += 1
+
+    def check(self, history, evaluations):
+        """
+        Checks the stopping conditions after a generation
+        :param history: The history.GenerationHistory of the run so far
+        :param evaluations: The number of satellites evaluated in the generation
+        :return: The reason for stopping, or None to carry on
+        """
+        if self.start_time is None:
+            self.start()
+        self.evaluations += evaluations
+        # Only the rows recorded since the last check are read, more than one when a resumed run is first checked.
+        # Generations with any undefined value are left out, as in history.perf
+        for row in history.performance_data[self.rows_read:len(history)]:
+            if not np.isnan(row).any():
+                self.follow(row[0], row[2])
+        self.rows_read = len(history)
+
+        if self.target_zeros is not None and self.max_zeros is not None and self.max_zeros >= self.target_zeros:
+            return 'target reached'
+        if self.stagnation is not None and self.generations > self.stagnation:
+            if self.best_before - self.window_minima[0][1] <= self.tolerance:
+                return 'stagnated for %d generations' % self.stagnation
+        if self.time_limit is not None and time.time() - self.start_time >= self.time_limit:
+            return 'time limit reached'
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return 'evaluation budget reached'
+        return None
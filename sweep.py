@@ -0,0 +1,210 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module runs sweeps of the genetic algorithm, every combination of target vector, seed and genetic algorithm
+parameters given by a JSON config file. The jobs are run across a pool of processes, each given the catalogue of the
+main process as it starts. The results of each job are saved as soon as it finishes, and jobs whose results already
+exist are skipped, so an interrupted sweep can simply be run again. A job is only skipped when the summary in its
+results records the same values, so changing the config runs the changed jobs again.
+
+A config file looks like:
+{
+    "output": "experiment_one",
+    "name": "test{target}",
+    "sorted_name": "test_sorted_{target}",
+    "targets": [[0.5, 0.5, 0.334, 0.5, 0.667], [0.5, 1, 0.334, 1, 0.667]],
+    "seeds": [1, 2],
+    "parameters": {"generations": [100], "pop_size": [100, 200], "mut_rate": [0.3]},
+    "options": {"operators": "batch"},
+    "workers": 4
+}
+The name is formatted with the target index, the seed, the job index and the parameters, as is the name of the sorted
+population, which defaults to the name followed by _sorted. The output directory is within the path given to run_sweep,
+the experiment scripts use utils.EXP_PATH so utils.load_exp_performance finds their results. Parameters with a list of
+values are swept, options are passed to every job as given. Workers is the number of processes, by default the number
+of CPUs. As the jobs already run in a pool of processes, the workers and islands options of genetic_algorithm, which
+would start another pool within every job, are not supported.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import nsga
+import utils
+
+DEFAULT_NAME = 'target{target}_seed{seed}_{index}'
+DEFAULT_SORTED_NAME = '{name}_sorted'
+RESULTS_FILE = 'results.jsonl'
+# The values of a job which are recorded in its summary, a job is only taken as done if they all match
+JOB_KEYS = ('target_reqs', 'seed', 'parameters', 'options')
+# The genetic_algorithm options which start their own pool of processes when above 1
+POOL_OPTIONS = ('workers', 'islands')
+
+
+def load_sweep(path):
+    """
+    Reads a sweep config file
+    :param path: The JSON config file
+    :return: dict of the config
+    """
+    with open(path) as config_file:
+        config = json.load(config_file)
+    if 'targets' not in config:
+        raise ValueError('The sweep config has no targets: ' + path)
+    return config
+
+
+def sweep_jobs(config):
+    """
+    Expands a sweep config into its jobs, every combination of target, seed and parameter values
+    :param config: dict of the config, see load_sweep
+    :return: list of job dicts, each with a unique name
+    """
+    parameters = config.get('parameters', {})
+    names = sorted(parameters)
+    jobs = []
+    combinations = itertools.product(range(len(config['targets'])), config.get('seeds', [None]),
+                                     itertools.product(*[parameters[name] for name in names]))
+    for index, (target, seed, values) in enumerate(combinations):
+        params = dict(zip(names, values))
+        fields = dict(params, target=target, seed=seed, index=index)
+        name = config.get('name', DEFAULT_NAME).format(**fields)
+        jobs.append({'name': name,
+                     'sorted_name': config.get('sorted_name', DEFAULT_SORTED_NAME).format(name=name, **fields),
+                     'target': target,
+                     'target_reqs': config['targets'][target],
+                     'seed': seed,
+                     'parameters': params,
+                     'options': config.get('options', {})})
+
+    if len(set(job['name'] for job in jobs) | set(job['sorted_name'] for job in jobs)) != 2 * len(jobs):
+        raise ValueError('The sweep job names are not unique, add the swept values to the name')
+    for job in jobs:
+        options = dict(job['parameters'], **job['options'])
+        pools = [option for option in POOL_OPTIONS if (options.get(option) or 1) > 1]
+        if pools:
+            raise ValueError('Sweep jobs already run in a pool of processes, %s would start another pool in each job' %
+                             ' and '.join(pools))
+    return jobs
+
+
+def load_results(output):
+    """
+    Reads the summaries of the jobs already run from the results file of an output directory
+    :param output: The output directory
+    :return: dict of the latest summary of each job name
+    """
+    path = os.path.join(output, RESULTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as results_file:
+        return dict((summary['name'], summary) for summary in map(json.loads, filter(str.strip, results_file)))
+
+
+def job_done(job, output, results):
+    """
+    Checks whether a job has already been run, its sorted performance is the last of its results written and its
+    summary must record the same target, seed, parameters and options. A name reused for different values, after the
+    sweep config is changed, is run again
+    :param job: The job dict
+    :param output: The output directory
+    :param results: The summaries of the jobs already run, from load_results
+    :return: True if the results of the job exist
+    """
+    summary = results.get(job['name'])
+    if summary is None or any(summary.get(key) != job[key] for key in JOB_KEYS):
+        return False
+    return os.path.exists(os.path.join(output, job['sorted_name'] + '_met_perf.csv'))
+
+
+def run_job(job, output):
+    """
+    Runs the genetic algorithm for a single job and saves the final population and performance, then the sorted
+    population, as utils.save_pop_data
+    :param job: The job dict
+    :param output: The output directory
+    :return: dict summarising the job
+    """
+    params = dict(job['parameters'])
+    generations = params.pop('generations', 100)
+    pop_size = params.pop('pop_size', 100)
+    mut_rate = params.pop('mut_rate', 0.3)
+    params.update(job['options'])
+
+    start = time.time()
+    final_pop, perf, met_perf = nsga.genetic_algorithm(generations, pop_size, mut_rate,
+                                                       np.array(job['target_reqs'], dtype=np.float64),
+                                                       seed=job['seed'], verbose=False, **params)
+    elapsed_time = time.time() - start
+
+    prefix = os.path.join(output, '')
+    saved = utils.save_pop_data(final_pop, job['name'], perf, met_perf, prefix)
+    saved = utils.save_pop_data(utils.sort_population(final_pop), job['sorted_name'], perf, met_perf, prefix) and saved
+    return {'name': job['name'],
+            'target': job['target'],
+            'target_reqs': job['target_reqs'],
+            'seed': job['seed'],
+            'parameters': job['parameters'],
+            'options': job['options'],
+            'elapsed': elapsed_time,
+            'generations': len(perf),
+            'max_zeros': float(perf[-1, 0]) if len(perf) else None,
+            'min_dist': float(perf[-1, 2]) if len(perf) else None,
+            'saved': saved}
+
+
+def initialise_job_worker(catalogue):
+    """
+    Stores the catalogue of the main process in a worker, run once as each worker starts
+    :param catalogue: The compiled catalogue
+    """
+    nsga.catalogue = catalogue
+
+
+def run_sweep(config, workers=None, rerun=False, path=''):
+    """
+    Runs every job of a sweep not already run, across a pool of processes. A summary of each job is appended to the
+    results file of the output directory as it finishes
+    :param config: The config file, or the dict of the config
+    :param workers: The number of processes, defaults to the number of CPUs
+    :param rerun: Whether to run every job again, replacing any results which already exist
+    :param path: The directory holding the output directory of the config
+    :return: list of the summaries of the jobs run
+    """
+    if not isinstance(config, dict):
+        config = load_sweep(config)
+    output = os.path.join(path, config.get('output', '.'))
+    if not os.path.isdir(output):
+        os.makedirs(output)
+
+    results = load_results(output)
+    jobs = [job for job in sweep_jobs(config) if rerun or not job_done(job, output, results)]
+    print('Running %d sweep jobs' % len(jobs))
+    summaries = []
+    if not jobs:
+        return summaries
+
+    # The workers are given the catalogue of this process. Forked workers already share it, but spawned workers, as on
+    # Windows, import nsga again and so also read the component files
+    with ProcessPoolExecutor(max_workers=workers or config.get('workers'), initializer=initialise_job_worker,
+                             initargs=(nsga.catalogue,)) as executor:
+        futures = [executor.submit(run_job, job, output) for job in jobs]
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            with open(os.path.join(output, RESULTS_FILE), 'a') as results_file:
+                results_file.write(json.dumps(summary) + '\n')
+            print('Finished %s in %.1fs, minimum distance %s' % (summary['name'], summary['elapsed'],
+                                                                  summary['min_dist']))
+    return summaries
+
+
+if __name__ == "__main__":
+    for config_path in sys.argv[1:]:
+        run_sweep(config_path)
@@ -0,0 +1,235 @@
+__author__ = "Aidan O'Brien"
+
+"""
+This module generates synthetic catalogues for testing how the genetic algorithm and parse_system scale past the real
+databases. The components are resampled from the real components of ComponentsDB.ods in the proportions of each type,
+with their physical values, power and price varied around the originals. The files are written with the columns and
+separators components.py reads, alongside the shipped structures and a set of systems built from the new components.
+
+Run as:
+    python synthetic_catalogue.py OUTPUT_DIR --components 100000 --systems 1000 --seed 1
+The output directory can then be used in place of the Component Files directory.
+"""
+
+import argparse
+import os
+import shutil
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import fuzzy_values
+
+COMPONENT_FILES = './Component Files'
+SEED_DATABASE = os.path.join(COMPONENT_FILES, 'ComponentsDB.ods')
+STRUCTURES_FILE = os.path.join(COMPONENT_FILES, 'structures.csv')
+ENCODING = 'iso-8859-1'
+# The file name and separator of each table, as components.py reads them
+COMPONENTS_FILE = ('components.csv', ',')
+PANELS_FILE = ('panels.csv', ',')
+HIDDEN_FILE = ('components_hidden.csv', ';')
+SYSTEMS_FILE = ('systems.csv', ';')
+
+# The spreadsheet columns named differently in the csv files
+SPREADSHEET_COLUMNS = {'Power Nom': 'Nom Power', 'Max Power (W)': 'Power (W)', 'Resolution (MP)': 'Resolution'}
+# Columns read by components.parse_component that the structures do not have, and the columns they are copied from
+PARSE_COLUMNS = {'Resolution (m)': 'Resolution', 'Attitude View': None, 'Disposal time(km/day)': 'Disposal time'}
+# The component types, see the Definitions sheet of the spreadsheet
+STRUCTURE_TYPE = 1
+SOLAR_PANEL_TYPE = 9
+# Each system has a component of each of these types, in order, and solar panels on its sides and ends
+SYSTEM_TYPES = (7, 8, 3, 2, 4, 5)
+SYSTEM_EXTERNALS = ('Ext Sides', 'Ext Ends')
+SIDE_PANELS = 7
+END_PANELS = 3
+
+# The spread of the log normal factor varying each group of columns, the columns of a group share the factor so the
+# difference between the nominal and maximum power is kept
+VARIED_COLUMNS = ((('X', 'Y', 'Z'), 0.1),
+                  (('Mass',), 0.2),
+                  (('Nom Power', 'Power (W)'), 0.2),
+                  (('Discharge Time (Wh)',), 0.2),
+                  (('Attitude Control moment',), 0.2),
+                  (('Price ($US)',), 0.3))
+# The chance of a system using a hidden, pre-built, component in place of a catalogue component
+HIDDEN_CHANCE = 0.1
+
+
+def read_ods_sheet(path, sheet):
+    """
+    Reads a sheet of an OpenDocument spreadsheet, the first row is the header
+    :param path: The .ods file
+    :param sheet: The name of the sheet
+    :return: Data frame of the sheet, every value as text
+    """
+    table_ns = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read('content.xml'))
+
+    for table in root.iter(table_ns + 'table'):
+        if table.get(table_ns + 'name') != sheet:
+            continue
+        rows = []
+        for row in table.iter(table_ns + 'table-row'):
+            cells = []
+            for cell in row.iter(table_ns + 'table-cell'):
+                repeat = int(cell.get(table_ns + 'number-columns-repeated', 1))
+                cells.extend([''.join(cell.itertext())] * min(repeat, 1024))
+            rows.extend([cells] * min(int(row.get(table_ns + 'number-rows-repeated', 1)), 1024))
+        header = rows[0]
+        while header and not header[-1]:
+            header = header[:-1]
+        return pd.DataFrame([(row + [''] * len(header))[:len(header)] for row in rows[1:] if any(row)],
+                            columns=header)
+    raise ValueError('No sheet named %s in %s' % (sheet, path))
+
+
+def csv_columns():
+    """
+    The columns of the component, panel and hidden component files, those of the structures without the size and with
+    the extra columns read by components.parse_component
+    :return: list of column names
+    """
+    structure_columns = pd.read_csv(STRUCTURES_FILE, sep=';', index_col=0, nrows=0, encoding=ENCODING).columns
+    return [column for column in structure_columns if column != 'Size'] + list(PARSE_COLUMNS)
+
+
+def seed_components(path=SEED_DATABASE):
+    """
+    Reads the real components used as templates from the spreadsheet, in the csv columns. The section headings and
+    structures are left out, and missing numbers are taken as 0
+    :param path: The .ods file
+    :return: Data frame of the template components
+    """
+    frame = read_ods_sheet(path, 'Components').rename(columns=SPREADSHEET_COLUMNS)
+    frame = frame[pd.to_numeric(frame['Type'], errors='coerce').notna() & (frame['Mass'] != '')]
+    frame = frame[pd.to_numeric(frame['Type']) != STRUCTURE_TYPE].reset_index(drop=True)
+
+    for column, source in PARSE_COLUMNS.items():
+        frame[column] = frame[source] if source is not None else 0
+    columns = csv_columns()
+    for column in columns:
+        if column not in frame:
+            frame[column] = 0
+        elif column != 'Name':
+            numbers = pd.to_numeric(frame[column], errors='coerce')
+            # Only the columns holding numbers are converted, others such as the connections are kept as text
+            if numbers.notna().any() or (frame[column] == '').all():
+                frame[column] = numbers.fillna(0)
+    frame['Name'] = [name.strip().replace('–', '-').encode(ENCODING, 'replace').decode(ENCODING)
+                     for name in frame['Name']]
+    return frame[columns]
+
+
+def synthetic_components(templates, size, rng, prefix='', types=None):
+    """
+    Creates synthetic components by resampling the templates and varying their values, the types keep the proportions
+    of the templates
+    :param templates: Data frame of template components, from seed_components
+    :param size: The number of components
+    :param rng: numpy random Generator
+    :param prefix: Added to the start of every name
+    :param types: The component types to sample, None samples every type
+    :return: Data frame of the synthetic components
+    """
+    if types is not None:
+        templates = templates[templates['Type'].isin(types)].reset_index(drop=True)
+    frame = templates.iloc[rng.integers(0, len(templates), size=size)].reset_index(drop=True)
+    for columns, spread in VARIED_COLUMNS:
+        factor = rng.lognormal(0, spread, size=size)
+        for column in columns:
+            frame[column] = frame[column] * factor
+    frame['Name'] = ['%s%s #%d' % (prefix, name, i) for i, name in enumerate(frame['Name'])]
+    return frame
+
+
+def synthetic_systems(components, hidden, structures, size, rng):
+    """
+    Creates systems from the synthetic components, each with a structure, a component of every type in SYSTEM_TYPES,
+    solar panels and random customer requirements, as components.parse_system reads them
+    :param components: Data frame of the synthetic components
+    :param hidden: Data frame of the synthetic hidden components
+    :param structures: Data frame of the structures
+    :param size: The number of systems
+    :param rng: numpy random Generator
+    :return: Data frame of the systems
+    """
+    structure = structures.iloc[rng.integers(0, len(structures), size=size)]
+    systems = pd.DataFrame({'Name': ['Synthetic system %d' % i for i in range(size)],
+                            'Structure': structure['Name'].values,
+                            'Size': ['%gU' % value for value in structure['Size'].values]})
+    for column, values in (('Size Imp', fuzzy_values.size_imp), ('Mass Imp', fuzzy_values.mass_imp),
+                           ('Down Sp', fuzzy_values.down_sp), ('Up Sp', fuzzy_values.up_sp),
+                           ('Alt Req', fuzzy_values.alt_req), ('Att Ctrl', fuzzy_values.att_ctrl),
+                           ('Remote', fuzzy_values.remote), ('RS Wave', fuzzy_values.rs_wave),
+                           ('RS Accuracy', fuzzy_values.rs_accuracy)):
+        systems[column] = rng.choice(list(values), size=size)
+
+    parts = [('Comp %d' % (i + 1), component_type) for i, component_type in enumerate(SYSTEM_TYPES)] + \
+        [(external, SOLAR_PANEL_TYPE) for external in SYSTEM_EXTERNALS]
+    for column, component_type in parts:
+        names = components['Name'].values[(components['Type'] == component_type).values]
+        hidden_names = hidden['Name'].values[(hidden['Type'] == component_type).values]
+        if not len(names):
+            names = components['Name'].values
+        choice = rng.choice(names, size=size)
+        if len(hidden_names):
+            choice = np.where(rng.random(size) < HIDDEN_CHANCE, rng.choice(hidden_names, size=size), choice)
+        systems[column] = choice
+    return systems
+
+
+def write_catalogue(output, num_components, num_systems=100, num_hidden=None, seed=None, overwrite=False):
+    """
+    Writes a synthetic catalogue, with the files components.py reads
+    :param output: The directory to write to
+    :param num_components: The number of components
+    :param num_systems: The number of systems
+    :param num_hidden: The number of hidden components, defaults to a twentieth of the components
+    :param seed: The seed of the random numbers, None seeds from the operating system
+    :param overwrite: Whether existing files may be replaced
+    :return: dict of the number of rows written to each file
+    """
+    file_names = [name for name, _ in (COMPONENTS_FILE, PANELS_FILE, HIDDEN_FILE, SYSTEMS_FILE)] + ['structures.csv']
+    existing = [name for name in file_names if os.path.exists(os.path.join(output, name))]
+    if existing and not overwrite:
+        raise ValueError('The catalogue files already exist in %s: %s' % (output, ', '.join(existing)))
+    if not os.path.isdir(output):
+        os.makedirs(output)
+
+    rng = np.random.default_rng(seed)
+    templates = seed_components()
+    structures = pd.read_csv(STRUCTURES_FILE, sep=';', index_col=0, encoding=ENCODING)
+    if num_hidden is None:
+        num_hidden = max(num_components // 20, 1)
+
+    tables = {COMPONENTS_FILE: synthetic_components(templates, num_components, rng),
+              HIDDEN_FILE: synthetic_components(templates, num_hidden, rng, prefix='Pre-built '),
+              # The side panels come first, followed by the end panels
+              PANELS_FILE: synthetic_components(templates, SIDE_PANELS + END_PANELS, rng, prefix='Panel ',
+                                                types=[SOLAR_PANEL_TYPE])}
+    tables[SYSTEMS_FILE] = synthetic_systems(tables[COMPONENTS_FILE], tables[HIDDEN_FILE], structures, num_systems,
+                                             rng)
+
+    for (name, separator), frame in tables.items():
+        frame.to_csv(os.path.join(output, name), sep=separator, encoding=ENCODING)
+    if os.path.abspath(output) != os.path.abspath(COMPONENT_FILES):
+        shutil.copyfile(STRUCTURES_FILE, os.path.join(output, 'structures.csv'))
+    return dict((name, len(frame)) for (name, _), frame in tables.items())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Writes a synthetic component catalogue')
+    parser.add_argument('output', help='The directory to write the catalogue to')
+    parser.add_argument('--components', type=int, default=1000, help='The number of components')
+    parser.add_argument('--systems', type=int, default=100, help='The number of systems')
+    parser.add_argument('--hidden', type=int, help='The number of hidden components')
+    parser.add_argument('--seed', type=int, help='The seed of the random numbers')
+    parser.add_argument('--overwrite', action='store_true', help='Replace any existing catalogue files')
+    args = parser.parse_args()
+
+    written = write_catalogue(args.output, args.components, args.systems, args.hidden, args.seed, args.overwrite)
+    for file_name, rows in written.items():
+        print('%s: %d rows' % (file_name, rows))
@@ -6,10 +6,442 @@ population creation and other sub functions and then the whole function.
 """
 
 from nsga import *
+from evaluation import evaluate_population, evaluate_genomes
+from population import Population, EMPTY_SLOT
+from ranking import crowding_distance
+from checkpoint import Checkpointer
+from archive import ParetoArchive
+from branch_bound import branch_and_bound
 import matplotlib.pyplot as plt
+import itertools
+import nsga
+import os
+import pandas as pd
+import tempfile
 import time
 import utils
 
+
+def compare_metrics(pop_size, rng=None):
+    """
+    Evaluates a parent and child population both a satellite at a time and as a whole population
+    :param pop_size: The size of the population to create
+    :param rng: numpy random Generator or seed, an unseeded Generator is created if None
+    :return: The metrics matrices from calculate_satellite_metrics and evaluate_population
+    """
+    rng = np.random.default_rng(rng)
+    pop = create_population(pop_size, rng)
+    pop = population_union(pop, create_child_population(pop, rng))
+    scalar_metrics = np.array([calculate_satellite_metrics(satellite)['Metrics'] for satellite in pop])
+    return scalar_metrics, evaluate_population(Population.from_dicts(pop), catalogue)
+
+
+def test_batch_metrics(pop_size=200):
+    """
+    Tests that the whole population evaluation matches calculate_satellite_metrics for every satellite
+    :param pop_size: The size of the population to create
+    """
+    scalar_metrics, batch_metrics = compare_metrics(pop_size)
+    assert np.allclose(scalar_metrics, batch_metrics, rtol=1e-12, atol=1e-12, equal_nan=True), \
+        'Batch metrics incorrect'
+    print('Batch metrics correct')
+
+
+def test_seeded_batch_metrics(pop_size=200, seed=1):
+    """
+    Tests the whole population evaluation of a seeded population, which is the same population for the same seed
+    :param pop_size: The size of the population to create
+    :param seed: The seed of the random numbers
+    """
+    scalar_metrics, batch_metrics = compare_metrics(pop_size, seed)
+    assert np.allclose(scalar_metrics, batch_metrics, rtol=1e-12, atol=1e-12, equal_nan=True), \
+        'Seeded batch metrics incorrect'
+    assert np.array_equal(batch_metrics, compare_metrics(pop_size, seed)[1], equal_nan=True), \
+        'Seeded populations differ'
+    print('Seeded batch metrics correct')
+
+
+def test_mutated_metrics(pop_size=50, mutations=100, seed=2):
+    """
+    Tests that satellites evaluated and then mutated many times, as in a long run, keep metrics matching the whole
+    population evaluation of their components
+    :param pop_size: The size of the population to create
+    :param mutations: The number of times each satellite is mutated
+    :param seed: The seed of the random numbers
+    """
+    rng = np.random.default_rng(seed)
+    pop = [calculate_satellite_metrics(satellite) for satellite in create_population(pop_size, rng)]
+    for _ in range(mutations):
+        pop = [calculate_satellite_metrics(mutate_satellite(satellite, 0.3, rng)) for satellite in pop]
+
+    scalar_metrics = np.array([satellite['Metrics'] for satellite in pop])
+    batch_metrics = evaluate_population(Population.from_dicts(pop), catalogue)
+    assert np.allclose(scalar_metrics, batch_metrics, rtol=1e-12, atol=1e-12, equal_nan=True), \
+        'Mutated metrics incorrect'
+    print('Mutated metrics correct')
+
+
+def valid_slots(satellite):
+    """
+    Checks the slots of a satellite by adding its components to its structure in order, as fill_satellite. Each must
+    fit, leaving some internal and external slots available, and the availability is never negative and matches the
+    details
+    :param satellite: An ID based satellite
+    :return: Whether the slots are valid
+    """
+    details = satellite['Details']
+    internal, external = details[0], details[2]
+    if internal != catalogue.structure_internal[satellite['Structure']] or \
+            external != catalogue.structure_external[satellite['Structure']]:
+        return False
+    for component in satellite['Components']:
+        if internal + catalogue.component_internal[component] <= 0 or \
+                external + catalogue.component_external[component] <= 0:
+            return False
+        # The details hold whole slots, as in fill_satellite
+        internal = details.dtype.type(internal + catalogue.component_internal[component])
+        external = details.dtype.type(external + catalogue.component_external[component])
+    return internal == details[1] and external == details[3] and internal >= 0 and external >= 0
+
+
+def test_batch_operators(pop_size=201, seeds=5):
+    """
+    Tests that the batch operators keep the semantics of the list operators. The children of the same parents, from
+    either set of operators, must all have valid slots and the same distribution of the number of components
+    :param pop_size: The size of the population, odd so the spare parent is carried over
+    :param seeds: The number of seeded parent populations
+    """
+    counts = {}
+    for operators in ('list', 'batch'):
+        counts[operators] = []
+        for seed in range(seeds):
+            parents = create_population(pop_size, 1000 + seed)
+            children = create_children(parents, pop_size, 0.3, operators, seed)
+            assert len(children) == pop_size, 'Wrong number of %s children' % operators
+            assert all(valid_slots(child) for child in children), 'Invalid slots in %s children' % operators
+            counts[operators] += [len(child['Components']) for child in children]
+
+    # The largest difference between the distributions of the number of components, the Kolmogorov-Smirnov statistic
+    grid = np.arange(max(max(counts['list']), max(counts['batch'])) + 1)
+    cumulative = [np.searchsorted(np.sort(counts[operators]), grid, side='right') / len(counts[operators])
+                  for operators in ('list', 'batch')]
+    assert np.max(np.abs(cumulative[0] - cumulative[1])) < 0.1, 'Batch children differ in their number of components'
+    print('Batch operators correct')
+
+
+def brute_force_fronts(fitness):
+    """
+    Sorts the satellites into non-dominated fronts by repeatedly removing the satellites no other remaining satellite
+    dominates
+    :param fitness: Matrix of fitness values, one row per satellite
+    :return: Vector of the front of each satellite
+    """
+    fronts = np.full(len(fitness), -1)
+    front = 0
+    while (fronts < 0).any():
+        remaining = np.where(fronts < 0)[0]
+        for i in remaining:
+            if not any((fitness[j] <= fitness[i]).all() and (fitness[j] < fitness[i]).any() for j in remaining):
+                fronts[i] = front
+        front += 1
+    return fronts
+
+
+def brute_force_crowding(fitness, fronts):
+    """
+    Calculates the crowding distance of every satellite a front and objective at a time, ties keep their order
+    :param fitness: Matrix of fitness values, one row per satellite
+    :param fronts: Vector of the front of each satellite
+    :return: Vector of crowding distances
+    """
+    distance = np.zeros(len(fitness))
+    for front in np.unique(fronts):
+        members = np.where(fronts == front)[0]
+        for m in range(fitness.shape[1]):
+            order = members[np.argsort(fitness[members, m], kind='stable')]
+            values = fitness[order, m]
+            spread = values[-1] - values[0]
+            distance[order[0]] = distance[order[-1]] = np.inf
+            for k in range(1, len(order) - 1):
+                distance[order[k]] += (values[k + 1] - values[k - 1]) / spread if spread > 0 else 0
+    return distance
+
+
+def test_nsga2_ranking(trials=300, seed=3):
+    """
+    Tests non_dominated_sort and crowding_distance against brute force, over random fitness matrices with tied values
+    and repeated rows, and with chunk sizes small enough to split the sort into many blocks
+    :param trials: The number of random fitness matrices
+    :param seed: The seed of the random numbers
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(trials):
+        size = int(rng.integers(1, 80))
+        shape = (size, int(rng.integers(1, 5)))
+        # Few distinct values give many ties, and some rows are repeated
+        fitness = rng.integers(0, 4, size=shape) / 3 if rng.random() < 0.5 else rng.random(shape)
+        if rng.random() < 0.5:
+            fitness = np.concatenate((fitness, fitness[rng.integers(0, size, size=size // 2)]))
+
+        fronts = non_dominated_sort(fitness, chunk=int(rng.choice([1, 100, 2 ** 24])))
+        assert np.array_equal(fronts, brute_force_fronts(fitness)), 'Non-dominated fronts incorrect'
+        assert np.allclose(crowding_distance(fitness, fronts), brute_force_crowding(fitness, fronts)), \
+            'Crowding distances incorrect'
+    print('NSGA-II ranking correct')
+
+
+def test_resume(generations=6, pop_size=20, seed=4):
+    """
+    Tests that a run checkpointed half way and resumed gives the same population and history as the uninterrupted run,
+    and that resuming with different options is refused
+    :param generations: The number of generations of the whole run
+    :param pop_size: The size of the population
+    :param seed: The seed of the random numbers
+    """
+    targets = np.array([0.334, 0.5, 0.334, 0.5, 0.334])
+    whole_pop, whole_perf, whole_met_perf = genetic_algorithm(generations, pop_size, 0.3, targets, seed=seed,
+                                                              verbose=False)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'checkpoint.npz')
+        genetic_algorithm(generations // 2, pop_size, 0.3, targets, seed=seed, checkpoint=Checkpointer(path, 1),
+                          verbose=False)
+        resumed_pop, resumed_perf, resumed_met_perf = genetic_algorithm(generations, pop_size, 0.3, targets,
+                                                                        resume_from=path, verbose=False)
+        try:
+            genetic_algorithm(generations, pop_size, 0.3, targets, ranking='nsga2', resume_from=path, verbose=False)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('Resumed with a different ranking')
+
+    assert np.array_equal(whole_perf, resumed_perf, equal_nan=True) and \
+        np.array_equal(whole_met_perf, resumed_met_perf, equal_nan=True), 'Resumed history differs'
+    for whole, resumed in zip(whole_pop, resumed_pop):
+        genomes = [(satellite['Structure'], satellite['Components'], satellite['Panels'], satellite['Rank'])
+                   for satellite in (whole, resumed)]
+        assert genomes[0] == genomes[1], 'Resumed population differs'
+        assert np.array_equal(whole['Fitness'], resumed['Fitness']), 'Resumed fitness differs'
+    assert len(whole_pop) == len(resumed_pop), 'Resumed population differs'
+    print('Resumed run correct')
+
+
+def test_multi_target(generations=6, pop_size=21, seed=5):
+    """
+    Tests that each target of a multi-target run evolves as a single-target run given the random stream of that target,
+    with either set of genetic operators. The odd population carries a spare parent into the children
+    :param generations: The number of generations
+    :param pop_size: The size of the population of each target
+    :param seed: The seed of the random numbers
+    """
+    targets = np.array([[0.334, 0.5, 0.334, 0.5, 0.334], [1, 1, 1, 1, 1], [0.5, 0.5, 0.265, 0.667, 0.5]])
+    streams = np.random.SeedSequence(seed).spawn(len(targets))
+    for operators in ('list', 'batch'):
+        results = multi_target_genetic_algorithm(generations, pop_size, 0.3, targets, operators=operators, seed=seed,
+                                                 verbose=False)
+        for target_reqs, stream, (multi_pop, multi_perf, multi_met_perf) in zip(targets, streams, results):
+            single_pop, single_perf, single_met_perf = genetic_algorithm(generations, pop_size, 0.3, target_reqs,
+                                                                         operators=operators, seed=stream,
+                                                                         verbose=False)
+            assert np.array_equal(multi_perf, single_perf, equal_nan=True) and \
+                np.array_equal(multi_met_perf, single_met_perf, equal_nan=True), 'Multi-target history differs'
+            genomes = [[(satellite['Structure'], satellite['Components'], satellite['Panels'], satellite['Rank'])
+                        for satellite in population] for population in (multi_pop, single_pop)]
+            assert genomes[0] == genomes[1], 'Multi-target population differs'
+    print('Multi-target runs correct')
+
+
+def fitness_satellites(fitness, seed=6):
+    """
+    Creates satellites with the given fitness in their first objectives, zero in the rest
+    :param fitness: Matrix of the fitness, a row per satellite
+    :param seed: The seed of the population
+    :return: The population of ID based satellites
+    """
+    fitness = np.asarray(fitness, dtype=float)
+    population = create_population(len(fitness), seed)
+    for satellite, row in zip(population, fitness):
+        satellite['Fitness'] = np.concatenate((row, np.zeros(10 - len(row))))
+    return population
+
+
+def test_pareto_archive(capacity=5, trials=20, seed=7):
+    """
+    Tests the epsilon-dominance archive: the entries of an insert, the replacement within an epsilon box, the removal of
+    dominated boxes and the bound on the size of the archive
+    :param capacity: The capacity of the bounded archive
+    :param trials: The number of random insert sequences
+    :param seed: The seed of the random numbers
+    """
+    archive = ParetoArchive(10, 0.1)
+    assert archive.insert(fitness_satellites([[0.55, 0.55], [0.2, 0.8]])) == 2 and len(archive) == 2, 'Insert failed'
+    assert archive.insert(fitness_satellites([[0.6, 0.6], [np.nan, 0]])) == 0 and len(archive) == 2, \
+        'Dominated or unevaluated satellite archived'
+    # Nearer the lower corner of the box of (0.55, 0.55) so replaces it
+    assert archive.insert(fitness_satellites([[0.51, 0.51]])) == 1 and len(archive) == 2, 'Box not replaced'
+    assert sorted(map(tuple, archive.fitness[:, :2])) == [(0.2, 0.8), (0.51, 0.51)], 'Wrong box entry'
+    # Farther from the lower corner, the archived satellite stays
+    assert archive.insert(fitness_satellites([[0.59, 0.52]])) == 0, 'Box replaced by a worse satellite'
+    # A box dominating that of (0.51, 0.51) removes it
+    assert archive.insert(fitness_satellites([[0.35, 0.35]])) == 1 and len(archive) == 2, 'Dominated box kept'
+    assert sorted(map(tuple, archive.fitness[:, :2])) == [(0.2, 0.8), (0.35, 0.35)], 'Wrong dominating entry'
+    assert len(archive.satellites()) == 2, 'Archived satellites lost'
+
+    rng = np.random.default_rng(seed)
+    for _ in range(trials):
+        unbounded, bounded = ParetoArchive(1000, 0.05), ParetoArchive(capacity, 0.05)
+        inserted = []
+        for _ in range(5):
+            fitness = rng.random((20, 3))
+            inserted.append(fitness)
+            unbounded.insert(fitness_satellites(fitness))
+            bounded.insert(fitness_satellites(fitness))
+            assert len(bounded) <= capacity, 'Archive over capacity'
+        # Every inserted satellite is in a box weakly dominated by the box of an archived satellite, and no archived
+        # box dominates another
+        boxes = np.floor(unbounded.fitness[:, :3] / 0.05)
+        for row in np.floor(np.concatenate(inserted) / 0.05):
+            assert np.any(np.all(boxes <= row, axis=1)), 'Inserted satellite not epsilon-dominated by the archive'
+        for box in boxes:
+            dominated = np.all(boxes >= box, axis=1) & np.any(boxes > box, axis=1)
+            assert not np.any(dominated), 'Dominated box archived'
+        assert len(bounded) == min(capacity, len(unbounded)), 'Bounded archive lost entries'
+    print('Pareto archive correct')
+
+
+def test_child_duplicates(pop_size=21, seed=8):
+    """
+    Tests that only the children repeating an earlier genome are counted as duplicates, never the parents or the spare
+    parent carried into the children as itself
+    :param pop_size: The size of the population, odd so the spare parent is carried over
+    :param seed: The seed of the random numbers
+    """
+    parents = create_population(4, seed)
+    parents.append(dict(parents[1]))
+    child = create_population(1, seed + 1)[0]
+    children = [parents[2], dict(parents[0]), child, dict(child), dict(child)]
+    duplicates = child_duplicates(parents + children, len(parents))
+    assert duplicates.tolist() == [False] * 6 + [True, False, True, True], 'Wrong duplicate children'
+    assert remove_duplicates(parents + children, 0.3, first_child=len(parents))[1] == 3, 'Wrong duplicate count'
+    population, count = remove_duplicates(parents + children, 0.3, 'drop', first_child=len(parents))
+    assert count == 3 and population == parents + children[:1] + children[2:3], 'Wrong duplicates dropped'
+
+    for operators in ('list', 'batch'):
+        parents = create_population(pop_size, seed)
+        children = create_children(parents, pop_size, 0.3, operators, seed)
+        spares = [j for j, satellite in enumerate(children) if any(satellite is parent for parent in parents)]
+        duplicates = child_duplicates(parents + children, pop_size)
+        assert spares and not duplicates[[pop_size + j for j in spares]].any(), \
+            'Spare parent counted as a %s duplicate' % operators
+    print('Child duplicates correct')
+
+
+# The columns of the catalogue files used by Catalogue, for the tiny catalogue of test_branch_and_bound
+CATALOGUE_COLUMNS = ['Name', 'Size', 'Internal Slots', 'External Slots', 'X', 'Y', 'Z', 'Mass', 'Nom Power',
+                     'Power (W)', 'Min Wavelength (nm)', 'Max Wavelength (nm)', 'Resolution', 'Bit Rate Down',
+                     'Bit Rate Up', 'Data Storage (MB)', 'Code Storage (MB)', 'RAM', 'Attitude Know (deg)',
+                     'Attitude Control moment', 'Discharge Time (Wh)', 'Price ($US)']
+
+
+def catalogue_frame(rows):
+    """
+    Creates a catalogue table, the missing values are 0
+    :param rows: list of dicts of the values of each row
+    :return: Data frame with the CATALOGUE_COLUMNS
+    """
+    return pd.DataFrame([dict(dict.fromkeys(CATALOGUE_COLUMNS, 0), **row) for row in rows], columns=CATALOGUE_COLUMNS)
+
+
+def tiny_catalogue():
+    """
+    A catalogue of two structures, six components and three panels, small enough to enumerate every design. The
+    components conflict, none is best at everything, so the Pareto set holds many designs
+    :return: Catalogue
+    """
+    structures = catalogue_frame([
+        {'Name': '1U', 'Size': 1, 'Internal Slots': 4, 'External Slots': 2, 'X': 0.1, 'Y': 0.1, 'Z': 0.1, 'Mass': 0.3},
+        {'Name': '2U', 'Size': 2, 'Internal Slots': 5, 'External Slots': 2, 'X': 0.1, 'Y': 0.1, 'Z': 0.2, 'Mass': 0.6}])
+    components = catalogue_frame([
+        {'Name': 'Radio', 'Internal Slots': -1, 'X': 0.09, 'Y': 0.09, 'Z': 0.01, 'Mass': 0.5, 'Nom Power': -1,
+         'Power (W)': -2, 'Bit Rate Down': 38400, 'Bit Rate Up': 9600},
+        {'Name': 'Camera', 'Internal Slots': -1, 'X': 0.09, 'Y': 0.09, 'Z': 0.03, 'Mass': 0.6, 'Nom Power': -1,
+         'Power (W)': -1.5, 'Min Wavelength (nm)': 400, 'Max Wavelength (nm)': 700, 'Resolution': 0.8},
+        {'Name': 'Computer', 'Internal Slots': -1, 'X': 0.09, 'Y': 0.09, 'Z': 0.01, 'Mass': 0.1, 'Nom Power': -0.5,
+         'Power (W)': -0.5, 'Data Storage (MB)': 1000, 'Code Storage (MB)': 100, 'RAM': 32},
+        {'Name': 'Battery', 'Internal Slots': -1, 'X': 0.09, 'Y': 0.09, 'Z': 0.02, 'Mass': 0.3, 'Nom Power': 1.5,
+         'Power (W)': 3, 'Discharge Time (Wh)': 20},
+        {'Name': 'Star tracker', 'Internal Slots': -1, 'X': 0.05, 'Y': 0.05, 'Z': 0.05, 'Mass': 0.4, 'Nom Power': -1,
+         'Power (W)': -1, 'Attitude Know (deg)': 0.01, 'Attitude Control moment': 0.05},
+        {'Name': 'Antenna', 'External Slots': -1, 'Mass': 0.1, 'Bit Rate Up': 38400}])
+    panels = catalogue_frame([{'Name': 'Side', 'Mass': 0.05, 'Nom Power': 1, 'Power (W)': 1},
+                              {'Name': 'Bare side', 'Mass': 0.01},
+                              {'Name': 'End', 'Mass': 0.02, 'Nom Power': 0.5, 'Power (W)': 0.5}])
+    return Catalogue(structures, components, panels, 2)
+
+
+def exhaustive_front(tiny, goals, max_copies):
+    """
+    Finds the Pareto set by evaluating every design of the catalogue. The components of a design are added in order
+    and each must leave some internal and external slots available, as when filling a satellite
+    :param tiny: The Catalogue
+    :param goals: The fitness goals, from fitness_goals
+    :param max_copies: The most copies of any one component in a design
+    :return: The unique fitness rows of the Pareto set, sorted
+    """
+    designs = []
+    for structure in range(tiny.num_structures):
+        for counts in itertools.product(range(max_copies + 1), repeat=tiny.num_components):
+            parts = [component for component, count in enumerate(counts) for _ in range(count)]
+            internal = tiny.structure_internal[structure] + np.cumsum(tiny.component_internal[parts])
+            external = tiny.structure_external[structure] + np.cumsum(tiny.component_external[parts])
+            if (internal > 0).all() and (external > 0).all():
+                designs.extend((structure, [side, end], parts) for side in tiny.side_panels for end in tiny.end_panels)
+
+    parts = np.full((len(designs), max(len(design[2]) for design in designs)), EMPTY_SLOT, dtype=np.int64)
+    for i, design in enumerate(designs):
+        parts[i, :len(design[2])] = design[2]
+    metrics = evaluate_genomes(np.array([design[0] for design in designs]), np.array([design[1] for design in designs]),
+                               parts, np.array([len(design[2]) for design in designs]), tiny)
+    fitness = calculate_fitness_matrix(metrics, goals)
+    return np.unique(fitness[non_dominated_sort(fitness) == 0], axis=0)
+
+
+def test_branch_and_bound(max_copies=(1, 2)):
+    """
+    Tests that branch and bound finds the same Pareto set as evaluating every design of a tiny catalogue
+    :param max_copies: The most copies of any one component to test with
+    """
+    targets = [np.array([0.334, 0.5, 0.334, 0.5, 0.334]), np.array([1, 1, 1, 1, 1]),
+               np.array([0.5, 0.5, 0.265, 0.667, 0.5])]
+    saved = nsga.catalogue
+    nsga.catalogue = tiny_catalogue()
+    try:
+        for target_reqs, copies in itertools.product(targets, max_copies):
+            expected = exhaustive_front(nsga.catalogue, fitness_goals(target_reqs), copies)
+            front, complete = branch_and_bound(target_reqs, copies, verbose=False)
+            found = np.unique(np.array([satellite['Fitness'] for satellite in front]), axis=0)
+            assert complete, 'Branch and bound did not finish'
+            assert len(expected) > 1, 'The Pareto set should hold more than one design'
+            assert np.array_equal(expected, found), 'Branch and bound Pareto set differs from exhaustive search'
+    finally:
+        nsga.catalogue = saved
+    print('Branch and bound correct')
+
+
+def test_steady_state_options():
+    """
+    Tests that the steady state genetic algorithm refuses the options of the generational one it does not support
+    """
+    targets = np.array([0.334, 0.5, 0.334, 0.5, 0.334])
+    for option in ({'ranking': 'nsga2'}, {'operators': 'batch'}, {'cache_size': 0}, {'topology': 'fully connected'},
+                   {'migrants': 1}, {'dedup': 'drop'}):
+        try:
+            genetic_algorithm(1, 15, 0.3, targets, workers=1, steady_state='worst', verbose=False, **option)
+        except ValueError:
+            continue
+        raise AssertionError('Steady state ran with %s' % option)
+    print('Steady state options refused')
+
+
 if __name__ == "__main__":
     # pop = create_population(20)
     # pop2 = create_population(21)
@@ -30,30 +30,31 @@ def plot_ga_performance(performance, name):
     # return True
 
 
-def save_pop_data(population, name, performance, met_perf):
+def save_pop_data(population, name, performance, met_perf, path=EXP_PATH):
     """
     This function saves the population to disk
     :param population: The satellite population to be saved
     :param name: The name of the file to be saved as
+    :param path: The directory the files are saved in, ending with a separator
     :return: Returns True
     """
 
     try:
-        satellite_data_file = open(EXP_PATH + name + '.txt', 'w')
+        satellite_data_file = open(path + name + '.txt', 'w')
         print('Saving ' + name + ' to file')
         for satellite in population:
             satellite_data_file.write("%s\n\n" % satellite)
         satellite_data_file.close()
 
         print('Saving performance...')
-        np.savetxt(EXP_PATH + name + '_performance.csv', performance, delimiter=',')
+        np.savetxt(path + name + '_performance.csv', performance, delimiter=',')
         # satellite_performance_file = open(exp_path + name + '_performance.txt')
         # satellite_performance_file.write("%s" % performance)
         # satellite_performance_file.close()
         print('Save complete')
 
         print('Saving metric averages...')
-        np.savetxt(EXP_PATH + name + '_met_perf.csv', met_perf, delimiter=',')
+        np.savetxt(path + name + '_met_perf.csv', met_perf, delimiter=',')
         return True
     except:
         print('Unable to print ' + name + ' to file')
@@ -76,16 +77,6 @@ def sort_population(population):
     :return: sorted population
     """
 
-    pop_size = len(population)
-    sorted_pop = []
-    i = 0
-
-    while i < pop_size:
-        for j in range(pop_size):
-            if population[j]['Rank'] == i:
-                sorted_pop.append(population[j])
-                i += 1
-                print('Placed in satellite: ' + str(i))
-                continue
-
-    return sorted_pop
\ No newline at end of file
+    # The ranks are not always consecutive, the heuristic ranking can give a satellite a second rank in place of its
+    # first, so the satellites are sorted rather than searched for each rank in turn
+    return sorted(population, key=lambda satellite: satellite['Rank'])
\ No newline at end of file